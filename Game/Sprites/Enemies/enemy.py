@@ -78,14 +78,8 @@ class Enemy(PhysicsSprite):
                     tile_x = int((check_x - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size)
                     tile_y = int((check_y - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size)
 
-                    for tile_key, tile_data in tilemap.tile_map.items():
-                        if (tile_data['x'] - tilemap.pos.x == tile_x and
-                            tile_data['y'] - tilemap.pos.y == tile_y):
-                            if 'solid' in tile_data.get('properties', []):
-                                ground_ahead = True
-                                break
-
-                    if ground_ahead:
+                    if tilemap.solid_at(tile_x, tile_y):
+                        ground_ahead = True
                         break
 
             if not ground_ahead:
@@ -43,53 +43,39 @@ class FlyingEnemy(Sprite):
         for tilemap in self.tilemaps:
             if not tilemap.rendered:
                 continue
-            left_tile = int(self.hitbox.left - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            right_tile = int(self.hitbox.right - 1 - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            top_tile = int(self.hitbox.top - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-            bottom_tile = int(self.hitbox.bottom - 1 - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-
-            for tile_key, tile_data in tilemap.tile_map.items():
-                if "solid" in tile_data["properties"]:
-                    tile_x = tile_data["x"] - tilemap.pos.x
-                    tile_y = tile_data["y"] - tilemap.pos.y
-
-                    if (left_tile <= tile_x <= right_tile and
-                        top_tile <= tile_y <= bottom_tile):
-
-                        tile_world_x = tile_x * tilemap.tile_size + tilemap.pos.x * tilemap.tile_size
-                        tile_world_y = tile_y * tilemap.tile_size + tilemap.pos.y * tilemap.tile_size
-                        tile_rect = pygame.Rect(tile_world_x, tile_world_y, tilemap.tile_size, tilemap.tile_size)
-
-                        if self.hitbox.colliderect(tile_rect):
-                            overlap_left = self.hitbox.right - tile_rect.left
-                            overlap_right = tile_rect.right - self.hitbox.left
-                            overlap_top = self.hitbox.bottom - tile_rect.top
-                            overlap_bottom = tile_rect.bottom - self.hitbox.top
-
-                            min_overlap = min(overlap_left, overlap_right, overlap_top, overlap_bottom)
-
-                            if min_overlap == overlap_left:
-                                self.hitbox.right = tile_rect.left - 2
-                                self.rect.right = self.hitbox.right - 5
-                                if self.move_axis.x > 0:
-                                    self.direction_x *= -1
-                            elif min_overlap == overlap_right:
-                                self.hitbox.left = tile_rect.right + 2
-                                self.rect.left = self.hitbox.left + 5
-                                if self.move_axis.x > 0:
-                                    self.direction_x *= -1
-                            elif min_overlap == overlap_top:
-                                self.hitbox.bottom = tile_rect.top - 2
-                                self.rect.bottom = self.hitbox.bottom - 5
-                                if self.move_axis.y > 0:
-                                    self.direction_y *= -1
-                            elif min_overlap == overlap_bottom:
-                                self.hitbox.top = tile_rect.bottom + 2
-                                self.rect.top = self.hitbox.top + 5
-                                if self.move_axis.y > 0:
-                                    self.direction_y *= -1
-
-                            return
+            for tile_x, tile_y in tilemap.solids_in_rect(self.hitbox):
+                tile_rect = tilemap.tile_rect(tile_x, tile_y)
+
+                if self.hitbox.colliderect(tile_rect):
+                    overlap_left = self.hitbox.right - tile_rect.left
+                    overlap_right = tile_rect.right - self.hitbox.left
+                    overlap_top = self.hitbox.bottom - tile_rect.top
+                    overlap_bottom = tile_rect.bottom - self.hitbox.top
+
+                    min_overlap = min(overlap_left, overlap_right, overlap_top, overlap_bottom)
+
+                    if min_overlap == overlap_left:
+                        self.hitbox.right = tile_rect.left - 2
+                        self.rect.right = self.hitbox.right - 5
+                        if self.move_axis.x > 0:
+                            self.direction_x *= -1
+                    elif min_overlap == overlap_right:
+                        self.hitbox.left = tile_rect.right + 2
+                        self.rect.left = self.hitbox.left + 5
+                        if self.move_axis.x > 0:
+                            self.direction_x *= -1
+                    elif min_overlap == overlap_top:
+                        self.hitbox.bottom = tile_rect.top - 2
+                        self.rect.bottom = self.hitbox.bottom - 5
+                        if self.move_axis.y > 0:
+                            self.direction_y *= -1
+                    elif min_overlap == overlap_bottom:
+                        self.hitbox.top = tile_rect.bottom + 2
+                        self.rect.top = self.hitbox.top + 5
+                        if self.move_axis.y > 0:
+                            self.direction_y *= -1
+
+                    return
 
     def update(self, dt):
         if self.hit >= pygame.time.get_ticks() + self.hit_cooldown:
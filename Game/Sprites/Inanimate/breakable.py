@@ -47,3 +47,4 @@ class Breakable(Sprite):
     def destroy(self):
         if self.tilemap and hasattr(self.tilemap, 'breakables'):
             self.tilemap.breakables.remove(self)
+            self.tilemap.breakable_destroyed(self)
@@ -4,7 +4,7 @@ from Game.Sprites.sprite import Sprite
 from Game.Sprites.Inanimate.item import Item
 
 class Chest(Sprite):
-    def __init__(self, pos, game, tilemap, contains=None):
+    def __init__(self, pos, game, tilemap, contains=None, opened=False):
         self.image_closed = pygame.surface.Surface((32, 32))
         self.image_closed.fill((139,69,19))
         self.image_opened = pygame.surface.Surface((32, 32))
@@ -20,7 +20,10 @@ class Chest(Sprite):
 
         self.rect = self.image.get_rect()
         self.rect.topright = pos
-        self.opened = False
+        # a chest opened before the map was unloaded stays open and empty
+        self.opened = opened
+        if opened:
+            self.image = self.image_opened
 
     def open(self):
         if not self.opened:
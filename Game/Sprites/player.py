@@ -1,9 +1,30 @@
 import pygame
 from Game.Sprites.sprite import Sprite
 from Game.Sprites.crystals import Crystal
-from Game.utils.utils import SpriteSheet
+from Game.utils.animations import Animations
+from Game.utils.utils import sprite_bounds
 from Game.utils.timer import Timer
 
+SHEET_OPTIONS = {"tile_size": 144, "colorkey": (0, 0, 0), "scale": (288, 288)}
+
+# name: (sheet, frame duration, loop)
+ANIMATIONS = {
+    "idle": ("little_riven/Idle.png", 15, True),
+    "death": ("little_riven/Death.png", 10, False),
+    "double_slash": ("little_riven/Double Slash.png", 30, False),
+    "fall": ("little_riven/Fall.png", 15, True),
+    "hurt": ("little_riven/Hurt.png", 15, False),
+    "idle_break": ("little_riven/Idle Break.png", 30, False),
+    "jump": ("little_riven/Jump.png", 5, True),
+    "run": ("little_riven/Run.png", 10, True),
+    "slash": ("little_riven/Slash.png", 30, False),
+    "smoke_in": ("little_riven/Smoke In.png", 10, False),
+    "smoke_out": ("little_riven/Smoke Out.png", 10, False),
+    "special_skill": ("little_riven/Special Skill.png", 10, False),
+}
+# loaded at startup and prefetched first, the rest follow in table order
+PRIORITY = ["idle", "run", "jump", "fall"]
+
 
 class Player(Sprite):
     def __init__(self, img=pygame.surface.Surface((32, 32)), pos=(0, 0), identifier=None, game=None, tilemap=None):
@@ -16,25 +37,15 @@ class Player(Sprite):
         self.tilemap = tilemap
         self.game = game
 
-        self.animations = {
-            "idle": (SpriteSheet("little_riven/Idle.png", tile_size=144, colorkey=(0, 0, 0)), 15, True),
-            "death": (SpriteSheet("little_riven/Death.png", tile_size=144, colorkey=(0, 0, 0)), 10, False),
-            "double_slash": (SpriteSheet("little_riven/Double Slash.png", tile_size=144, colorkey=(0, 0, 0)), 30, False),
-            "fall": (SpriteSheet("little_riven/Fall.png", tile_size=144, colorkey=(0, 0, 0)), 15, True),
-            "hurt": (SpriteSheet("little_riven/Hurt.png", tile_size=144, colorkey=(0, 0, 0)), 15, False),
-            "idle_break": (SpriteSheet("little_riven/Idle Break.png", tile_size=144, colorkey=(0, 0, 0)), 30, False),
-            "jump": (SpriteSheet("little_riven/Jump.png", tile_size=144, colorkey=(0, 0, 0)), 5, True),
-            "run": (SpriteSheet("little_riven/Run.png", tile_size=144, colorkey=(0, 0, 0)), 10, True),
-            "slash": (SpriteSheet("little_riven/Slash.png", tile_size=144, colorkey=(0, 0, 0)), 30, False),
-            "smoke_in": (SpriteSheet("little_riven/Smoke In.png", tile_size=144, colorkey=(0, 0, 0)), 10, False),
-            "smoke_out": (SpriteSheet("little_riven/Smoke Out.png", tile_size=144, colorkey=(0, 0, 0)), 10, False),
-            "special_skill": (SpriteSheet("little_riven/Special Skill.png", tile_size=144, colorkey=(0, 0, 0)), 10, False),
-        }
+        # sheets load on first use, prefetch decodes the rest in the background
+        self.animations = Animations(ANIMATIONS, SHEET_OPTIONS)
+        self.animations.prefetch(PRIORITY)
 
         self.crystals = 0
 
         self.animation = "idle"
         self.frame = 0
+        self.image_flipped = None
 
         self.visual_scale = 2
         self.scaled_sprite_size = 144 * self.visual_scale
@@ -171,6 +182,8 @@ class Player(Sprite):
             self.attributes["last_x_press_time"] = current_time
 
     def update(self, dt, events=None):
+        self.animations.poll()
+
         self.timers["attack_cooldown"].update()
 
         if self.timers["damage"] > 0:
@@ -303,7 +316,7 @@ class Player(Sprite):
             images = sprite_sheet.get_images_list()
             if images:
                 if int(self.frame) < len(images):
-                    self.image = images[int(self.frame)]
+                    self.set_frame(current_anim_key, int(self.frame))
                 else:
                     if self.attributes.get("double_slashing"):
                         self.attributes["double_slashing"] = False
@@ -313,14 +326,10 @@ class Player(Sprite):
                     self.animation = "idle"
                     self.frame = 0
                     if self.image:
-                        self.image = pygame.transform.scale(self.image, (self.scaled_sprite_size, self.scaled_sprite_size))
-                        self.image.set_colorkey((0,0,0))
                         self.update_visual_rect()
                     return
             self.frame += frame_duration / 60
             if self.image:
-                self.image = pygame.transform.scale(self.image, (self.scaled_sprite_size, self.scaled_sprite_size))
-                self.image.set_colorkey((0,0,0))
                 self.update_visual_rect()
             return
 
@@ -358,17 +367,15 @@ class Player(Sprite):
         images = sprite_sheet.get_images_list()
         if images:
             if is_looping:
-                self.image = images[int(self.frame) % len(images)]
+                self.set_frame(self.animation, int(self.frame) % len(images))
             elif int(self.frame) < len(images):
-                self.image = images[int(self.frame)]
+                self.set_frame(self.animation, int(self.frame))
             else:
                 self.animation = "idle"
                 self.frame = 0
                 return
 
         if self.image:
-            self.image = pygame.transform.scale(self.image, (self.scaled_sprite_size, self.scaled_sprite_size))
-            self.image.set_colorkey((0,0,0))
             self.update_visual_rect()
 
         self.frame += frame_duration / 60
@@ -394,11 +401,10 @@ class Player(Sprite):
                 'offset_y': 100
             }
 
-        sprite = idle_images[0]
-
-        scaled_sprite = pygame.transform.scale(sprite, (self.scaled_sprite_size, self.scaled_sprite_size))
-
-        bounds = self.get_sprite_bounds(scaled_sprite)
+        bounds = self.animations.bounds("idle", 0)
+        if bounds is None:
+            size = idle_images[0].get_width()
+            bounds = {'left': size // 4, 'top': size // 4, 'width': size // 2, 'height': size // 2}
 
         char_width = 40
         char_height = 70
@@ -418,45 +424,31 @@ class Player(Sprite):
 
     @staticmethod
     def get_sprite_bounds(surface):
-        width, height = surface.get_size()
-
-        left = width
-        right = 0
-        top = height
-        bottom = 0
-
-        found_pixel = False
-
-        try:
-            surface.lock()
-
-            for y in range(height):
-                for x in range(width):
-                    pixel = surface.get_at((x, y))
-
-                    if pixel[3] > 0 and pixel[:3] != (0, 0, 0):
-                        found_pixel = True
-                        left = min(left, x)
-                        right = max(right, x)
-                        top = min(top, y)
-                        bottom = max(bottom, y)
-        finally:
-            surface.unlock()
-
-        if not found_pixel:
+        bounds = sprite_bounds(surface)
+        if bounds is None:
+            width, height = surface.get_size()
             return {
                 'left': width // 4,
                 'top': height // 4,
                 'width': width // 2,
                 'height': height // 2
             }
-
-        return {
-            'left': left,
-            'top': top,
-            'width': right - left + 1,
-            'height': bottom - top + 1
-        }
+        return bounds
+
+    def frame_bounds(self, animation=None, frame=None):
+        # Visible box of an animation frame from the baked table, relative to
+        # the top left of the scaled sprite
+        animation = animation or self.animation
+        sheet = self.animations[animation][0]
+        if frame is None:
+            frame = int(self.frame)
+        return self.animations.bounds(animation, frame % len(sheet.images))
+
+    def set_frame(self, animation, index):
+        # Frames come pre-scaled with a flipped twin, nothing is allocated here
+        frames, flipped = self.animations.frames(animation)
+        self.image = frames[index]
+        self.image_flipped = flipped[index]
 
     def update_visual_rect(self):
         self.visual_rect.x = self.rect.x - self.char_offset_x
@@ -495,22 +487,15 @@ class Player(Sprite):
             if not tilemap.rendered:
                 continue
 
-            left_tile = int(self.rect.left - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            right_tile = int(self.rect.right - 1 - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            bottom_tile = int (self.rect.bottom - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
+            left_tile, _, right_tile, _ = tilemap.tile_bounds(self.rect)
+            bottom_tile = int(self.rect.bottom - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
 
             # Check tiles
-            for tile_x in range(left_tile, right_tile + 1):
-                original_tile_x = tile_x
-                original_tile_y = bottom_tile
-
-                for tile_key, tile_data in tilemap.tile_map.items():
-                    if (tile_data['x'] - tilemap.pos.x == original_tile_x and
-                        tile_data['y'] - tilemap.pos.y == original_tile_y):
-                        if 'solid' in tile_data.get('properties', []):
-                            tile_top = tile_data['y'] * tilemap.tile_size
-                            if abs(self.rect.bottom - tile_top) <= 2:
-                                return True
+            row = tilemap.first_solid_below(left_tile, right_tile, bottom_tile)
+            if row is not None:
+                tile_top = tilemap.tile_rect(left_tile, row).top
+                if abs(self.rect.bottom - tile_top) <= 2:
+                    return True
 
             # Check breakables
             for breakable in tilemap.breakables.sprite_dict.values():
@@ -527,28 +512,8 @@ class Player(Sprite):
             if not tilemap.rendered:
                 continue
 
-            left_tile = int(self.rect.left - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            right_tile = int(self.rect.right - 1 - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            top_tile = int(self.rect.top - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-            bottom_tile = int(self.rect.bottom - 1 - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-
-            for tile_y in range(top_tile, bottom_tile + 1):
-                for tile_key, tile_data in tilemap.tile_map.items():
-                    if (tile_data['x'] - tilemap.pos.x == left_tile and
-                        tile_data['y'] - tilemap.pos.y == tile_y):
-                        if 'solid' in tile_data.get('properties', []):
-                            tile_right = (tile_data['x'] + 1) * tilemap.tile_size
-                            if self.rect.left < tile_right and self.rect.right > tile_data['x'] * tilemap.tile_size:
-                                return True
-
-            for tile_y in range(top_tile, bottom_tile + 1):
-                for tile_key, tile_data in tilemap.tile_map.items():
-                    if (tile_data['x'] - tilemap.pos.x == right_tile and
-                        tile_data['y'] - tilemap.pos.y == tile_y):
-                        if 'solid' in tile_data.get('properties', []):
-                            tile_left = tile_data['x'] * tilemap.tile_size
-                            if self.rect.right > tile_left and self.rect.left < (tile_data['x'] + 1) * tilemap.tile_size:
-                                return True
+            if tilemap.solids_in_rect(self.rect):
+                return True
 
             # Check breakable wall collisions
             for breakable in tilemap.breakables.sprite_dict.values():
@@ -561,46 +526,22 @@ class Player(Sprite):
             if not tilemap.rendered:
                 continue
 
-            left_tile = int(self.rect.left - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            right_tile = int(self.rect.right - 1 - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            top_tile = int(self.rect.top - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-            bottom_tile = int(self.rect.bottom - 1 - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
+            left_tile, top_tile, right_tile, bottom_tile = tilemap.tile_bounds(self.rect)
 
             if self.velocity.y >= 0:
-                for tile_x in range(left_tile, right_tile + 1):
-                    for tile_key, tile_data in tilemap.tile_map.items():
-                        x = tile_data['x'] - tilemap.pos.x == tile_x
-                        y = tile_data['y'] - tilemap.pos.y >= bottom_tile
-                        y_off = tile_data['y'] - tilemap.pos.y <= bottom_tile + 1
-                        if x and y and y_off:
-                            if 'solid' in tile_data.get('properties', []):
-                                tile_top = tile_data['y'] * tilemap.tile_size
-                                tile_bottom = tile_top + tilemap.tile_size
-                                tile_left = tile_data['x'] * tilemap.tile_size
-                                tile_right = tile_left + tilemap.tile_size
-
-                                if (self.rect.bottom > tile_top and
-                                    self.rect.top < tile_bottom and
-                                    self.rect.right > tile_left and
-                                    self.rect.left < tile_right):
-                                    self.rect.bottom = tile_top
-                                    return True
+                row = tilemap.first_solid_below(left_tile, right_tile, bottom_tile, max_rows=2)
+                if row is not None:
+                    tile_rect = tilemap.tile_rect(left_tile, row)
+                    if self.rect.bottom > tile_rect.top and self.rect.top < tile_rect.bottom:
+                        self.rect.bottom = tile_rect.top
+                        return True
 
             if self.velocity.y < 0:
-                for tile_x in range(left_tile, right_tile + 1):
-                    for tile_key, tile_data in tilemap.tile_map.items():
-                        if (tile_data['x'] - tilemap.pos.x == tile_x and
-                            tile_data['y'] - tilemap.pos.y == top_tile):
-                            if 'solid' in tile_data.get('properties', []):
-                                tile_bottom = (tile_data['y'] + 1) * tilemap.tile_size
-                                tile_left = tile_data['x'] * tilemap.tile_size
-                                tile_right = tile_left + tilemap.tile_size
-
-                                if (self.rect.top <= tile_bottom and
-                                    self.rect.right > tile_left and
-                                    self.rect.left < tile_right):
-                                    self.rect.top = tile_bottom
-                                    return True
+                if tilemap.first_solid_below(left_tile, right_tile, top_tile) is not None:
+                    tile_rect = tilemap.tile_rect(left_tile, top_tile)
+                    if self.rect.top <= tile_rect.bottom:
+                        self.rect.top = tile_rect.bottom
+                        return True
 
             for breakable in tilemap.breakables.sprite_dict.values():
                 if breakable.is_solid() and self.rect.colliderect(breakable.rect):
@@ -625,15 +566,15 @@ class Player(Sprite):
             display_image = self.image
 
             if self.attributes["flipped"]:
-                display_image = pygame.transform.flip(self.image, True, False)
+                display_image = self.image_flipped
+                if display_image is None:
+                    display_image = pygame.transform.flip(self.image, True, False)
 
             screen_pos = (self.visual_rect.x - self.game.camera.offset.x,
                          self.visual_rect.y - self.game.camera.offset.y)
             surf.blit(display_image, screen_pos)
 
-            from Game.utils.config import get_config
-            config = get_config()
-            if config.get("debug", {}).get("show_collision_boxes", False):
+            if self.game.debug.get("show_collision_boxes", False):
                 screen_collision_rect = (self.rect.x - self.game.camera.offset.x,
                                        self.rect.y - self.game.camera.offset.y,
                                        self.rect.width, self.rect.height)
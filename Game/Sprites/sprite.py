@@ -51,35 +51,26 @@ class PhysicsSprite(Sprite):
             if not tilemap.rendered:
                 continue
 
-            left_tile = int(self.rect.left - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            right_tile = int(self.rect.right - 1 - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            top_tile = int(self.rect.top - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-            bottom_tile = int(self.rect.bottom - 1 - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
+            left_tile, top_tile, right_tile, bottom_tile = tilemap.tile_bounds(self.rect)
 
             # Check tile collisions
             for tile_y in range(top_tile, bottom_tile + 1):
-                for tile_key, tile_data in tilemap.tile_map.items():
-                    if (tile_data['x'] - tilemap.pos.x == left_tile and
-                        tile_data['y'] - tilemap.pos.y == tile_y):
-                        if 'solid' in tile_data.get('properties', []):
-                            tile_right = (tile_data['x'] + 1) * tilemap.tile_size
-                            if self.rect.left < tile_right and self.rect.right > tile_data['x'] * tilemap.tile_size:
-                                self.rect.left = tile_right
-                                self.vel.x = 0
-                                self.collisions["left"] = True
-                                collision_occurred = True
+                if tilemap.solid_at(left_tile, tile_y):
+                    tile_rect = tilemap.tile_rect(left_tile, tile_y)
+                    if self.rect.left < tile_rect.right and self.rect.right > tile_rect.left:
+                        self.rect.left = tile_rect.right
+                        self.vel.x = 0
+                        self.collisions["left"] = True
+                        collision_occurred = True
 
             for tile_y in range(top_tile, bottom_tile + 1):
-                for tile_key, tile_data in tilemap.tile_map.items():
-                    if (tile_data['x'] - tilemap.pos.x == right_tile and
-                        tile_data['y'] - tilemap.pos.y == tile_y):
-                        if 'solid' in tile_data.get('properties', []):
-                            tile_left = tile_data['x'] * tilemap.tile_size
-                            if self.rect.right > tile_left and self.rect.left < (tile_data['x'] + 1) * tilemap.tile_size:
-                                self.rect.right = tile_left
-                                self.vel.x = 0
-                                self.collisions["right"] = True
-                                collision_occurred = True
+                if tilemap.solid_at(right_tile, tile_y):
+                    tile_rect = tilemap.tile_rect(right_tile, tile_y)
+                    if self.rect.right > tile_rect.left and self.rect.left < tile_rect.right:
+                        self.rect.right = tile_rect.left
+                        self.vel.x = 0
+                        self.collisions["right"] = True
+                        collision_occurred = True
 
             # Check breakable collisions
             for breakable in tilemap.breakables.sprite_dict.values():
@@ -113,51 +104,27 @@ class PhysicsSprite(Sprite):
             if not tilemap.rendered:
                 continue
 
-            left_tile = int(self.rect.left - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            right_tile = int(self.rect.right - 1 - tilemap.pos.x * tilemap.tile_size) // tilemap.tile_size
-            top_tile = int(self.rect.top - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
-            bottom_tile = int(self.rect.bottom - 1 - tilemap.pos.y * tilemap.tile_size) // tilemap.tile_size
+            left_tile, top_tile, right_tile, bottom_tile = tilemap.tile_bounds(self.rect)
 
             if self.vel.y >= 0:
-                for tile_x in range(left_tile, right_tile + 1):
-                    for tile_key, tile_data in tilemap.tile_map.items():
-                        x = tile_data['x'] - tilemap.pos.x == tile_x
-                        y = tile_data['y'] - tilemap.pos.y >= bottom_tile
-                        y_off = tile_data['y'] - tilemap.pos.y <= bottom_tile + 1
-                        if x and y and y_off:
-                            if 'solid' in tile_data.get('properties', []):
-                                tile_top = tile_data['y'] * tilemap.tile_size
-                                tile_bottom = tile_top + tilemap.tile_size
-                                tile_left = tile_data['x'] * tilemap.tile_size
-                                tile_right = tile_left + tilemap.tile_size
-
-                                if (self.rect.bottom > tile_top and
-                                    self.rect.top < tile_bottom and
-                                    self.rect.right > tile_left and
-                                    self.rect.left < tile_right):
-                                    self.rect.bottom = tile_top
-                                    self.vel.y = 0
-                                    self.collisions["bottom"] = True
-                                    collision_occurred = True
+                row = tilemap.first_solid_below(left_tile, right_tile, bottom_tile, max_rows=2)
+                if row is not None:
+                    tile_rect = tilemap.tile_rect(left_tile, row)
+                    if self.rect.bottom > tile_rect.top and self.rect.top < tile_rect.bottom:
+                        self.rect.bottom = tile_rect.top
+                        self.vel.y = 0
+                        self.collisions["bottom"] = True
+                        collision_occurred = True
 
             # Check tile ceiling collisions (moving up)
             if self.vel.y < 0:
-                for tile_x in range(left_tile, right_tile + 1):
-                    for tile_key, tile_data in tilemap.tile_map.items():
-                        if (tile_data['x'] - tilemap.pos.x == tile_x and
-                            tile_data['y'] - tilemap.pos.y == top_tile):
-                            if 'solid' in tile_data.get('properties', []):
-                                tile_bottom = (tile_data['y'] + 1) * tilemap.tile_size
-                                tile_left = tile_data['x'] * tilemap.tile_size
-                                tile_right = tile_left + tilemap.tile_size
-
-                                if (self.rect.top <= tile_bottom and
-                                    self.rect.right > tile_left and
-                                    self.rect.left < tile_right):
-                                    self.rect.top = tile_bottom
-                                    self.vel.y = 0
-                                    self.collisions["top"] = True
-                                    collision_occurred = True
+                if tilemap.first_solid_below(left_tile, right_tile, top_tile) is not None:
+                    tile_rect = tilemap.tile_rect(left_tile, top_tile)
+                    if self.rect.top <= tile_rect.bottom:
+                        self.rect.top = tile_rect.bottom
+                        self.vel.y = 0
+                        self.collisions["top"] = True
+                        collision_occurred = True
 
             for breakable in tilemap.breakables.sprite_dict.values():
                 if breakable.is_solid() and self.rect.colliderect(breakable.rect):
@@ -1,28 +1,59 @@
 import pygame.font
 
-from Game.Sprites.player import Player
+from Game.Sprites.player import ANIMATIONS, PRIORITY, SHEET_OPTIONS, Player
 
+from Game.utils.assets import assets
+from Game.utils.atlas import Atlas
 from Game.utils.camera import Camera
-from Game.utils.config import get_config
+from Game.utils.loader import Loader
+from Game.utils.config import config
 from Game.utils.utils import *
 from Game.utils.spritegroup import SpriteGroup
+from Game.utils.text import text_cache
 from Game.utils.tilemaps import TileMap
+from Game.utils.transisitions import Transitions
+from Game.utils.world import World
 from Game.Sprites.Enemies.enemy import Enemy
 from Game.utils.hud import Hud
 
+HEART_IMAGES = {
+    "full": "hud/Heart Container Silver/heart_silver_full.png",
+    "half": "hud/Heart Container Silver/heart_silver_half.png",
+    "empty": "hud/Heart Container General/heart_empty.png",
+}
+HEART_SHEETS = {
+    "shine": "hud/Heart Container Silver/heart_silver_shine_full.png",
+    "blink": "hud/Heart Container Silver/heart_silver_blink_full.png",
+}
+# environment: {type: (sheet, SpriteSheet options)}, "cut" names a cut_tiles_json file
+TILE_SHEETS = {
+    "cave": {
+        "big_rocks": ("cave_tiles/Cave - BigRocks1.png", {"cut": "cut_tiles_json/Cave-BigRocks1.json"}),
+        "floor": ("cave_tiles/Cave - Floor.png", {"cut": "cut_tiles_json/Cave-Floor.json"}),
+        "platform": ("cave_tiles/Cave - Platforms.png", {"cut": "cut_tiles_json/Cave-Platforms.json"}),
+    },
+    "mossy": {
+        "platform": ("mossy_tiles/Mossy - FloatingPlatforms.png", {"tile_size": 512}),
+    },
+}
+
 
 class Game:
     def __init__(self):
         pygame.init()
-        self.screen = pygame.display.set_mode(tuple(get_config()["resolution"]))
+        self.screen = pygame.display.set_mode(config["resolution"])
         pygame.display.set_caption("Metroidvania Game")
         self.running = True
 
-        self.camera = Camera(*get_config()["resolution"])
+        self.camera = Camera(*config["resolution"])
 
         self.sprite_group = SpriteGroup()
+        self.transitions = Transitions()
 
         self.tilemaps = {}
+        self.world = World()
+        self.apply_config(config)
+        config.subscribe(self.apply_config)
 
         self.assets = {}
         self.setup()
@@ -30,66 +61,139 @@ class Game:
         self.tilemap_current = "cave"
         self.tilemap = self.tilemaps[self.tilemap_current]
 
-        self.player = Player(pos=(get_config()["resolution"][0]/2, get_config()["resolution"][1]/2), game=self, tilemap=self.tilemap)
+        width, height = config["resolution"]
+        self.player = Player(pos=(width/2, height/2), game=self, tilemap=self.tilemap)
+        self.world.update(self.player.rect, wait=True)
         self.num = 0
 
-        self.hud = Hud(self)
-        self.clock = pygame.time.Clock()
-
         pygame.font.init()
         self.fonts = {
             "workbench": pygame.font.Font("Game/assets/fonts/workbench.ttf", 36),
             "Arial": pygame.font.SysFont("Arial", 16)
         }
 
+        self.hud = Hud(self)
+        self.clock = pygame.time.Clock()
+
     def setup(self):
+        self.preload_assets()
+        self.load_assets()
+
+        self.tilemaps["cave"] = TileMap(self, tile_size=48, pos=(0, 0), rendered=True)
+        self.tilemaps["mossy"] = TileMap(self, tile_size=48, pos=(30, 0), rendered=False)
+
+        maps = config["tilemaps"]
+
+        # Maps are only registered here, the world loads them once the player
+        # gets close
+        for name, tilemap in self.tilemaps.items():
+            self.world.add(name, tilemap, "Game/assets/" + maps[name])
+
+    def apply_config(self, config):
+        # called again by the config service whenever config.json is saved
+        self.debug = config.get("debug", default={})
+        self.world.prefetch_radius = config.get("world", "prefetch_radius", default=1000)
+        self.world.memory_budget = config.get("world", "memory_budget_mb", default=64) * 1024 * 1024
+
+    def load_assets(self):
         self.assets = {
             "hud":
                 {
                     "heart": {
-                        "full": load_image("hud/Heart Container Silver/heart_silver_full.png"),
-                        "half": load_image("hud/Heart Container Silver/heart_silver_half.png"),
-                        "shine": SpriteSheet("hud/Heart Container Silver/heart_silver_shine_full.png", tile_size=16),
-                        "blink": SpriteSheet("hud/Heart Container Silver/heart_silver_blink_full.png", tile_size=16),
-                        "empty": load_image("hud/Heart Container General/heart_empty.png"),
+                        "full": load_image(HEART_IMAGES["full"]),
+                        "half": load_image(HEART_IMAGES["half"]),
+                        "shine": SpriteSheet(HEART_SHEETS["shine"], tile_size=16),
+                        "blink": SpriteSheet(HEART_SHEETS["blink"], tile_size=16),
+                        "empty": load_image(HEART_IMAGES["empty"]),
                     },
                 },
-            "cave":
-                {
-                    "big_rocks": SpriteSheet("cave_tiles/Cave - BigRocks1.png", cut=load_json_as_dict("cut_tiles_json/Cave-BigRocks1.json")),
-                    "floor": SpriteSheet("cave_tiles/Cave - Floor.png", cut=load_json_as_dict("cut_tiles_json/Cave-Floor.json")),
-                    "platform": SpriteSheet("cave_tiles/Cave - Platforms.png", cut=load_json_as_dict("cut_tiles_json/Cave-Platforms.json")),
-                },
-           "mossy":
-               {
-                   "platform": SpriteSheet("mossy_tiles/Mossy - FloatingPlatforms.png", tile_size=512),
-               }
         }
+        for environment, sheets in TILE_SHEETS.items():
+            self.assets[environment] = {name: SpriteSheet(path, **self.sheet_options(options))
+                                        for name, (path, options) in sheets.items()}
+
+        # The small frames of these sheets share a few atlas pages instead of
+        # keeping every full sheet image alive, when that takes less memory
+        self.atlas = Atlas()
+        pack_sheets([self.assets["hud"]["heart"]["shine"], self.assets["hud"]["heart"]["blink"],
+                     *self.assets["cave"].values()], self.atlas)
+
+    @staticmethod
+    def sheet_options(options):
+        if "cut" in options:
+            return dict(options, cut=load_json_as_dict(options["cut"]))
+        return options
+
+    def preload_assets(self):
+        # Decodes every image the game starts with on a thread pool, the
+        # load_image / SpriteSheet calls after this are all cache hits
+        loader = Loader()
+        for path in HEART_IMAGES.values():
+            loader.add_image(path)
+        for path in HEART_SHEETS.values():
+            loader.add_sheet(path, tile_size=16)
+        for sheets in TILE_SHEETS.values():
+            for path, options in sheets.values():
+                loader.add_sheet(path, **self.sheet_options(options))
+        for name in PRIORITY:
+            loader.add_sheet(ANIMATIONS[name][0], **SHEET_OPTIONS)
+        loader.add_image("miscellaneous/crystal.png", size=(16, 16))
+
+        self.load_stats = loader.run(self.draw_loading)
+
+    def draw_loading(self, done, total, name):
+        pygame.event.pump()
+        # redrawing for every file would cost more than the loading itself
+        now = pygame.time.get_ticks()
+        if done < total and now - getattr(self, "loading_drawn", -100) < 33:
+            return
+        self.loading_drawn = now
+
+        width, height = self.screen.get_size()
+        bar = pygame.Rect(width // 4, height // 2 - 5, width // 2, 10)
+        self.screen.fill("#000F17")
+        pygame.draw.rect(self.screen, (255, 255, 255), bar, 1)
+        pygame.draw.rect(self.screen, (255, 255, 255), (bar.x, bar.y, bar.width * done // total, bar.height))
+        pygame.display.flip()
 
-        self.tilemaps["cave"] = TileMap(self, tile_size=48, pos=(0, 0), rendered=True)
-        self.tilemaps["mossy"] = TileMap(self, tile_size=48, pos=(30, 0), rendered=False)
-
-        maps = get_config()["tilemaps"]
-
-        for name, tilemaps in self.tilemaps.items():
-            tilemaps.load_map("Game/assets/" + maps[name])
+    def reload_assets(self):
+        # drop the cached files so edited assets are read from disk again
+        assets.clear()
+        self.load_assets()
+        for tilemap in self.tilemaps.values():
+            tilemap.reload_assets()
 
     def draw(self):
+        self.camera.reset_stats()
+
         self.screen.fill("#000F17")
         self.player.draw(self.screen, (0, 0))
 
-        self.sprite_group.draw(self.screen, self.camera.offset)
+        self.sprite_group.draw(self.screen, self.camera.offset, self.camera)
 
         for tilemap in self.tilemaps.values():
             if tilemap.rendered:
                 tilemap.render(self.screen, self.camera.offset, 5)
 
-                tilemap.enemies.draw(self.screen, self.camera.offset)
+                # enemies go over the tiles, render() doesn't draw them
+                tilemap.enemies.draw(self.screen, self.camera.offset, self.camera)
 
         self.hud.draw(self.screen)
 
+        self.transitions.draw(self.screen)
+
+        if self.debug.get("show_culling_stats", False):
+            self.draw_culling_stats()
+
         pygame.display.flip()
 
+    def draw_culling_stats(self):
+        y = self.screen.get_height() - 20
+        for category, stats in self.camera.stats.items():
+            text = f"{category}: {stats['drawn']} drawn, {stats['skipped']} skipped"
+            self.screen.blit(text_cache.render(self.fonts["Arial"], text, (255, 255, 255)), (10, y))
+            y -= 18
+
     def update(self, dt):
         events = []
         for event in pygame.event.get():
@@ -97,9 +201,13 @@ class Game:
                 self.running = False
             events.append(event)
 
+        config.poll()
+        self.world.update(self.player.rect)
+
         self.sprite_group.update(dt)
         self.player.update(dt, events)
         self.hud.update(dt)
+        self.transitions.update(dt)
         for tilemap in self.tilemaps.values():
             tilemap.update(dt)
             if tilemap.rendered:
@@ -111,4 +219,6 @@ class Game:
             dt = self.clock.tick(60) / 1000
 
             self.draw()
-            self.update(dt)
\ No newline at end of file
+            self.update(dt)
+        self.world.shutdown()
+        config.unsubscribe(self.apply_config)
@@ -0,0 +1,107 @@
+from collections.abc import Mapping
+
+import pygame
+
+from Game.utils.loader import Loader
+from Game.utils.utils import SpriteSheet, sprite_bounds
+
+
+class AnimationSheet:
+    # One animation of a character, the SpriteSheet is only built the first
+    # time the animation is used
+    def __init__(self, path, frame_duration, loop, options):
+        self.path = path
+        self.frame_duration = frame_duration
+        self.loop = loop
+        self.options = options
+        self.sheet = None
+        self.frames = None
+        self.flipped = None
+
+    @property
+    def loaded(self):
+        return self.sheet is not None
+
+    def get(self):
+        if self.sheet is None:
+            self.sheet = SpriteSheet(self.path, **self.options)
+            if "frame_bounds" not in self.sheet.meta:
+                # computed once, then stored with the baked frames
+                self.sheet.meta["frame_bounds"] = [sprite_bounds(img) for img in self.sheet.get_images_list()]
+                self.sheet.save_bake()
+            self.build_frames()
+        return self.sheet, self.frame_duration, self.loop
+
+    def build_frames(self):
+        # Ready to blit frames facing both ways. SDL ignores the colorkey of
+        # RLE encoded alpha surfaces, so colorkeyed pixels are made fully
+        # transparent instead.
+        colorkey = self.options.get("colorkey")
+        self.frames = self.sheet.get_images_list()
+        for img in self.frames:
+            if colorkey is not None:
+                img.set_colorkey(None)
+                mask = pygame.mask.from_threshold(img, colorkey, (1, 1, 1, 255))
+                mask.to_surface(img, setcolor=(0, 0, 0, 0), unsetcolor=None)
+            img.set_alpha(255, pygame.RLEACCEL)
+        self.flipped = [pygame.transform.flip(img, True, False) for img in self.frames]
+        for img in self.flipped:
+            img.set_alpha(255, pygame.RLEACCEL)
+
+    def bounds(self, frame):
+        return self.get()[0].meta["frame_bounds"][frame]
+
+    def release(self):
+        if self.sheet is not None:
+            self.sheet.release(drop=True)
+            self.sheet = None
+            self.frames = None
+            self.flipped = None
+
+
+class Animations(Mapping):
+    # {name: (SpriteSheet, frame duration, loop)} that loads sheets on access.
+    # prefetch() decodes the sheets in the background in priority order so
+    # most of them are cache hits by the time they are first played.
+    def __init__(self, animations, options):
+        self.sheets = {name: AnimationSheet(path, frame_duration, loop, options)
+                       for name, (path, frame_duration, loop) in animations.items()}
+        self.loader = Loader()
+
+    def __getitem__(self, name):
+        return self.sheets[name].get()
+
+    def __iter__(self):
+        return iter(self.sheets)
+
+    def __len__(self):
+        return len(self.sheets)
+
+    def prefetch(self, priority=()):
+        names = list(priority) + [name for name in self.sheets if name not in priority]
+        for name in names:
+            sheet = self.sheets[name]
+            if not sheet.loaded:
+                self.loader.add_sheet(sheet.path, **sheet.options)
+        self.loader.start()
+
+    def poll(self):
+        return self.loader.poll()
+
+    def frames(self, name):
+        sheet = self.sheets[name]
+        sheet.get()
+        return sheet.frames, sheet.flipped
+
+    def bounds(self, name, frame):
+        # Visible pixel box of one frame, None when the frame is empty
+        return self.sheets[name].bounds(frame)
+
+    def loaded(self):
+        return [name for name, sheet in self.sheets.items() if sheet.loaded]
+
+    def release(self, *names):
+        # Frees the frames of animations that are not needed right now, they
+        # load again on their next use
+        for name in names or list(self.sheets):
+            self.sheets[name].release()
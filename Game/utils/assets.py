@@ -0,0 +1,153 @@
+import copy
+import json
+from collections import OrderedDict
+
+import pygame
+
+from Game.utils.bake import bake_path, read_bake
+
+BASE_PATH = "Game/assets/"
+MEMORY_BUDGET = 128 * 1024 * 1024
+
+
+class AssetManager:
+    # Loaded files keyed by what was asked for (kind, path and load options),
+    # the same key is only decoded once. acquire()/release() count the users
+    # of an entry, entries nobody holds are dropped least recently used first
+    # once the cache goes over memory_budget bytes.
+    def __init__(self, memory_budget=MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader, sizeof):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        value = loader()
+        size = sizeof(value)
+        self.entries[key] = [value, size, 0]
+        self.size += size
+        self.evict()
+        return value
+
+    def put(self, key, value, sizeof):
+        if key in self.entries:
+            return
+        size = sizeof(value)
+        self.entries[key] = [value, size, 0]
+        self.size += size
+        self.evict()
+
+    def acquire(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[2] += 1
+
+    def release(self, key, drop=False):
+        # drop frees the entry right away once nobody holds it
+        entry = self.entries.get(key)
+        if entry is not None and entry[2] > 0:
+            entry[2] -= 1
+            if drop and not entry[2]:
+                self.forget(key)
+            self.evict()
+
+    def evict(self):
+        if self.size <= self.memory_budget:
+            return
+        for key, (_, size, refs) in list(self.entries.items()):
+            if refs:
+                continue
+            del self.entries[key]
+            self.size -= size
+            if self.size <= self.memory_budget:
+                break
+
+    def forget(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "bytes": self.size}
+
+    def image_key(self, path, colorkey=None, size=None):
+        return ("image", path, tuple(colorkey) if colorkey is not None else None,
+                tuple(size) if size is not None else None)
+
+    def image(self, path, colorkey=None, size=None):
+        # The surface is shared by every caller, copy it before drawing on it
+        return self.get(self.image_key(path, colorkey, size),
+                        lambda: self.load_image(path, colorkey, size), surface_size)
+
+    def load_image(self, path, colorkey, size):
+        return self.finish_image(self.decode_image(path, size), path, colorkey)
+
+    # load_image split in two for Loader: decode_image is safe to run on a
+    # worker thread, finish_image converts for the display on the main thread
+    def decode_image(self, path, size=None):
+        img = pygame.image.load(BASE_PATH + path)
+        if size is not None:
+            img = pygame.transform.scale(img, size)
+        return img
+
+    def finish_image(self, img, path, colorkey):
+        try:
+            img = img.convert_alpha()
+        except FileNotFoundError:
+            pass
+        if colorkey is not None:
+            img.set_colorkey(colorkey)
+        if "icon_" in path:
+            img = pygame.transform.scale(img, (16, 16))
+        return img
+
+    def bake_path_key(self, source, options):
+        return "bake_path", source, json.dumps(options, sort_keys=True)
+
+    def bake_path(self, source, options):
+        # the source hash is only computed once per run
+        return self.get(self.bake_path_key(source, options), lambda: bake_path(source, options), lambda value: 0)
+
+    def bake(self, path):
+        baked = self.get(("bake", path), lambda: read_bake(path), bake_size)
+        if baked is None:
+            # not baked yet, don't remember the miss
+            self.forget(("bake", path))
+        return baked
+
+    def json(self, path):
+        # Callers get their own copy, the cached data is never handed out
+        return copy.deepcopy(self.get(("json", path), lambda: self.load_json(path), json_size))
+
+    def load_json(self, path):
+        with open(BASE_PATH + path, 'r') as f:
+            return json.load(f)
+
+
+def surface_size(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def bake_size(baked):
+    if baked is None:
+        return 0
+    return sum(surface_size(img) for _, img in baked[0])
+
+
+def json_size(data):
+    return len(json.dumps(data))
+
+
+assets = AssetManager()
@@ -0,0 +1,82 @@
+import pygame
+
+from Game.utils.assets import surface_size
+
+PAGE_SIZE = 2048
+PADDING = 1
+
+
+class Atlas:
+    # Packs small images into pages of at most PAGE_SIZE with a simple shelf
+    # packer and hands back subsurfaces of the pages. Every pack() lays its
+    # images out first and only allocates the width and height each page
+    # actually uses. Images that don't fit on an empty page stay as they are.
+    def __init__(self, page_size=PAGE_SIZE, padding=PADDING):
+        self.page_size = page_size
+        self.padding = padding
+        self.pages = []
+
+    def pack(self, images):
+        # Returns the packed images in the same order, or None when the pages
+        # would take at least as much memory as the images they replace
+        layout = []
+        # per page: list of [y, height, next free x]
+        shelves = []
+        for img in images:
+            w, h = img.get_size()
+            if w + self.padding > self.page_size or h + self.padding > self.page_size:
+                layout.append(None)
+                continue
+            for page, page_shelves in enumerate(shelves):
+                pos = self.place(page_shelves, w, h)
+                if pos is not None:
+                    break
+            else:
+                shelves.append([])
+                page = len(shelves) - 1
+                pos = self.place(shelves[-1], w, h)
+            layout.append((page, pos))
+
+        sizes = [(max(shelf[2] for shelf in page_shelves), page_shelves[-1][0] + page_shelves[-1][1])
+                 for page_shelves in shelves]
+        if sum(w * h * 4 for w, h in sizes) >= self.replaced(images, layout):
+            return None
+
+        pages = [pygame.Surface(size, flags=pygame.SRCALPHA) for size in sizes]
+        self.pages.extend(pages)
+        return [img if place is None else self.copy(pages[place[0]], img, place[1])
+                for img, place in zip(images, layout)]
+
+    def replaced(self, images, layout):
+        # Subsurface frames keep their whole sheet alive, so packing them
+        # frees the sheet, not just the frame
+        parents = {}
+        for img, place in zip(images, layout):
+            if place is not None:
+                parent = img.get_abs_parent()
+                parents[id(parent)] = parent
+        return sum(surface_size(parent) for parent in parents.values())
+
+    def place(self, shelves, w, h):
+        w += self.padding
+        h += self.padding
+        for shelf in shelves:
+            y, height, x = shelf
+            if h <= height and x + w <= self.page_size:
+                shelf[2] += w
+                return x, y
+
+        y = shelves[-1][0] + shelves[-1][1] if shelves else 0
+        if y + h > self.page_size:
+            return None
+        shelves.append([y, h, w])
+        return 0, y
+
+    def copy(self, page, img, pos):
+        # RGBA_MAX onto the cleared page copies the pixels exactly instead of
+        # alpha blending them
+        page.blit(img, pos, special_flags=pygame.BLEND_RGBA_MAX)
+        return page.subsurface(pygame.Rect(pos, img.get_size()))
+
+    def memory_size(self):
+        return sum(surface_size(page) for page in self.pages)
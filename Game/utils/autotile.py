@@ -0,0 +1,115 @@
+from Game.utils.tilegrid import VARIANT_DARK, VARIANT_NONE
+
+AUTOTILE_MAP = {
+    tuple(sorted([(1, 0), (0, 1)])): 0,
+    tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
+    tuple(sorted([(-1, 0), (0, 1)])): 2,
+    tuple(sorted([(-1, 0), (0, -1), (0, 1)])): 3,
+    tuple(sorted([(-1, 0), (0, -1)])): 4,
+    tuple(sorted([(-1, 0), (0, -1), (1, 0)])): 5,
+    tuple(sorted([(1, 0), (0, -1)])): 6,
+    tuple(sorted([(1, 0), (0, -1), (0, 1)])): 7,
+    tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8
+}
+
+AUTOTILE_PROPERTY = "autotile"
+
+RIGHT = 1
+LEFT = 2
+DOWN = 4
+UP = 8
+DIRECTIONS = {(1, 0): RIGHT, (-1, 0): LEFT, (0, 1): DOWN, (0, -1): UP}
+
+# neighbour bitmask -> variant, None where AUTOTILE_MAP has no entry
+VARIANTS = [None] * 16
+for neighbors, variant in AUTOTILE_MAP.items():
+    VARIANTS[sum(DIRECTIONS[offset] for offset in neighbors)] = variant
+
+
+def autotile(grid, rect=None):
+    # Picks the variant of every tile with the "autotile" property from the
+    # tiles of the same type around it. Each row of a type is packed into one
+    # int so a whole row of left/right/up/down neighbours is a shift. Span
+    # cells that get a new variant are copied into the arrays first, cells
+    # drawn without an image are left alone. rect limits the pass to an
+    # inclusive tile rect, e.g. around an edit.
+    bit = grid.flag_names.get(AUTOTILE_PROPERTY)
+    if bit is None:
+        return 0
+
+    if rect is None:
+        rect = grid.extent()
+    left, top, right, bottom = rect
+
+    # occupancy includes one cell around the rect so its edge cells see
+    # their neighbours, targets are only the autotile cells inside it
+    occupied = {}
+    targets = {}
+    variants = {}
+    for x, y, cell in grid.iter_rect(left - 1, top - 1, right + 1, bottom + 1):
+        type_id = cell[0]
+        shift = 1 << (x - left + 1)
+        rows = occupied.setdefault(type_id, {})
+        rows[y] = rows.get(y, 0) | shift
+        if (cell[3] & bit and left <= x <= right and top <= y <= bottom and
+                cell[1] != VARIANT_NONE and cell[1] != VARIANT_DARK):
+            rows = targets.setdefault(type_id, {})
+            rows[y] = rows.get(y, 0) | shift
+            variants[(x, y)] = cell[1]
+
+    changes = []
+    for type_id, rows in targets.items():
+        occ = occupied[type_id]
+        for y, row in rows.items():
+            current = occ[y]
+            masks = ((current >> 1, RIGHT), (current << 1, LEFT),
+                     (occ.get(y + 1, 0), DOWN), (occ.get(y - 1, 0), UP))
+
+            while row:
+                low = row & -row
+                row ^= low
+                mask = 0
+                for neighbors, direction in masks:
+                    if neighbors & low:
+                        mask |= direction
+
+                variant = VARIANTS[mask]
+                x = left - 1 + low.bit_length() - 1
+                if variant is not None and variants[(x, y)] != variant:
+                    changes.append((x, y, variant))
+
+    # span cells among the changes move into the arrays, grown once for all
+    spans = [(x, y) for x, y, _ in changes
+             if grid.index(x, y) < 0 or not grid.type_id[grid.index(x, y)]]
+    if spans:
+        grid.fit(min(x for x, _ in spans), min(y for _, y in spans),
+                 max(x for x, _ in spans), max(y for _, y in spans))
+    for x, y, variant in changes:
+        grid.variant[grid.densify(x, y)] = variant
+    return len(changes)
+
+
+if __name__ == "__main__":
+    # python -m Game.utils.autotile: autotiles a 3x2 block stored as a span,
+    # then breaks a rock over its bottom right tile like the game does
+    import pygame
+
+    from Game.Sprites.Inanimate.breakable import Breakable
+    from Game.utils.tilegrid import Span, encode_variant
+    from Game.utils.tilemaps import TileMap
+
+    tilemap = TileMap(None)
+    tilemap.tile_size = 48
+    grid = tilemap.grid
+    flags = grid.encode_flags(["solid", AUTOTILE_PROPERTY])
+    grid.add_span(Span(0, 0, 3, 2, 5, grid.type_key("cave", "platform"), encode_variant(1), flags),
+                  overwrite=True)
+    autotile(grid)
+    assert [[grid.cell(x, y)[1] for x in range(3)] for y in range(2)] == [[0, 1, 2], [6, 5, 4]]
+
+    rock = Breakable(pygame.Surface((48, 48)), tilemap.tile_rect(2, 1).topleft, tilemap, health=1)
+    tilemap.breakables.append(rock)
+    rock.take_damage(1)
+    assert grid.cell(2, 1) is None
+    assert [[grid.cell(x, y)[1] for x in range(2)] for y in range(2)] == [[0, 1], [6, 4]]
+    print("autotile ok")
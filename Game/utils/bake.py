@@ -0,0 +1,105 @@
+import glob
+import hashlib
+import json
+import os
+import struct
+
+import pygame
+
+# Baked sprite sheets: the frames of a SpriteSheet (or of a frame sequence
+# folder) after cutting, scaling and colorkeying, stored as raw RGBA so a warm
+# start never decodes or scales a PNG. The file name is
+# <name>-<source key>-<content hash>: the source key hashes the source path and
+# the options that change the frames, the content hash also covers the source
+# files, so editing either simply misses the old bake.
+BAKE_DIR = "Game/cache/assets"
+FORMAT_VERSION = 1
+MAGIC = b"MVAS"
+
+# magic, version, metadata length
+HEADER = struct.Struct("<4sHI")
+
+
+def bake_path(source, options):
+    # source is an image file, or a folder holding a PNG frame sequence
+    digest = hashlib.sha1()
+    if os.path.isdir(source):
+        for name in frame_files(source):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(source, name), 'rb') as f:
+                digest.update(f.read())
+    else:
+        with open(source, 'rb') as f:
+            digest.update(f.read())
+    options = json.dumps(options, sort_keys=True).encode("utf-8")
+    digest.update(options)
+    key = hashlib.sha1(os.path.normpath(source).replace(os.sep, "/").encode("utf-8") + b"\0" + options)
+    return os.path.join(BAKE_DIR, "%s-%s-%s.bin" % (bake_name(source), key.hexdigest()[:8], digest.hexdigest()[:16]))
+
+
+def frame_files(folder):
+    return sorted(name for name in os.listdir(folder) if name.lower().endswith(".png"))
+
+
+def bake_name(source):
+    return os.path.splitext(os.path.basename(source))[0].replace(" ", "_")
+
+
+def write_bake(path, frames, meta):
+    # frames: list of (key, surface)
+    header = {
+        "frames": [[key, *img.get_size()] for key, img in frames],
+        "meta": meta,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # older bakes of the same source with the same options are dead once the
+    # source changes, bakes with other options or of other sources stay
+    prefix = os.path.basename(path).rsplit("-", 1)[0]
+    for old in glob.glob(os.path.join(os.path.dirname(path), glob.escape(prefix) + "-*.bin")):
+        if old != path:
+            os.remove(old)
+
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for _, img in frames:
+            f.write(pygame.image.tobytes(img, "RGBA"))
+    os.replace(tmp, path)
+
+
+def read_bake(path):
+    # Returns (frames, meta) or None when there is no usable bake
+    return finish_bake(decode_bake(path))
+
+
+def decode_bake(path):
+    # Only reads the file, safe to call from a worker thread
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, header_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        offset = HEADER.size
+        header = json.loads(data[offset:offset + header_length])
+
+        offset += header_length
+        frames = []
+        for key, w, h in header["frames"]:
+            length = w * h * 4
+            img = pygame.image.frombytes(data[offset:offset + length], (w, h), "RGBA")
+            offset += length
+            frames.append((tuple(key) if isinstance(key, list) else key, img))
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    return frames, header["meta"]
+
+
+def finish_bake(baked):
+    if baked is None:
+        return None
+    frames, meta = baked
+    return [(key, img.convert_alpha()) for key, img in frames], meta
@@ -1,11 +1,16 @@
 import pygame
 
 class Camera:
-    def __init__(self, width, height):
+    def __init__(self, width, height, margin=64):
         self.offset = pygame.Vector2(0, 0)
         self.width = width
         self.height = height
 
+        # Extra pixels around the screen that still count as visible, covers
+        # sprites whose image is bigger than their rect
+        self.margin = margin
+        self.stats = {}
+
     def apply(self, entity):
         return pygame.Rect(
             entity.rect.x - self.offset.x,
@@ -18,3 +23,20 @@ class Camera:
         # Center the camera on the target
         self.offset.x = target.rect.centerx - (self.width // 2)
         self.offset.y = target.rect.centery - (self.height // 2)
+
+    def view_rect(self, margin=None):
+        if margin is None:
+            margin = self.margin
+        return pygame.Rect(int(self.offset.x) - margin, int(self.offset.y) - margin,
+                           self.width + margin * 2, self.height + margin * 2)
+
+    def is_visible(self, rect, margin=None):
+        return self.view_rect(margin).colliderect(rect)
+
+    def record(self, category, drawn, skipped):
+        stats = self.stats.setdefault(category, {"drawn": 0, "skipped": 0})
+        stats["drawn"] += drawn
+        stats["skipped"] += skipped
+
+    def reset_stats(self):
+        self.stats.clear()
@@ -0,0 +1,159 @@
+import pygame
+
+from Game.utils.tilegrid import FLAG_DARK, VARIANT_DARK
+
+CHUNK_SIZE = 512
+DARK_LAYER = "dark"
+
+
+class ChunkCache:
+    # Static tiles of a TileMap baked into CHUNK_SIZE surfaces, one set per z
+    # layer plus DARK_LAYER for the dark fill. Chunks are keyed in world pixels
+    # and baked lazily the first time they are on screen. Chunks hold
+    # premultiplied colors so a half transparent tile edge baked onto the
+    # clear chunk and then onto the screen comes out as if it was drawn
+    # straight onto the screen.
+    def __init__(self, tilemap, chunk_size=CHUNK_SIZE):
+        self.tilemap = tilemap
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self.premultiplied = {}
+        # draw() needs both for every layer every frame, they only change
+        # with the tiles
+        self.span = None
+        self.rect = None
+
+    def invalidate(self):
+        self.chunks.clear()
+        self.premultiplied.clear()
+        self.span = None
+        self.rect = None
+
+    def max_tile_span(self):
+        if self.span is None:
+            self.span = self.tilemap.max_tile_span()
+        return self.span
+
+    def premultiply(self, img):
+        pre = self.premultiplied.get(img)
+        if pre is None:
+            pre = self.premultiplied[img] = img.premul_alpha()
+        return pre
+
+    def invalidate_tile(self, tx, ty):
+        tilemap = self.tilemap
+        # an edit can add a tile type or grow the map
+        self.span = None
+        self.rect = None
+        span = self.max_tile_span()
+        x = (tx + int(tilemap.pos.x)) * tilemap.tile_size
+        y = (ty + int(tilemap.pos.y)) * tilemap.tile_size
+        cx0, cy0, cx1, cy1 = self.chunk_range(pygame.Rect(x, y, span, span))
+
+        for key in list(self.chunks):
+            _, cx, cy = key
+            if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                del self.chunks[key]
+
+    def chunk_range(self, rect):
+        size = self.chunk_size
+        return (int(rect.left // size), int(rect.top // size),
+                int((rect.right - 1) // size), int((rect.bottom - 1) // size))
+
+    def get(self, layer, cx, cy):
+        key = (layer, cx, cy)
+        if key not in self.chunks:
+            self.chunks[key] = self.bake(layer, cx, cy)
+        return self.chunks[key]
+
+    def bake(self, layer, cx, cy):
+        tilemap = self.tilemap
+        grid = tilemap.grid
+        tile_size = tilemap.tile_size
+        pos_x, pos_y = int(tilemap.pos.x), int(tilemap.pos.y)
+
+        left = cx * self.chunk_size
+        top = cy * self.chunk_size
+        span = self.max_tile_span()
+
+        # Tiles are drawn from their top left corner and can be bigger than a
+        # cell, so tiles up to one span before the chunk can still reach into it
+        rect = ((left - span) // tile_size - pos_x,
+                (top - span) // tile_size - pos_y,
+                (left + self.chunk_size - 1) // tile_size - pos_x,
+                (top + self.chunk_size - 1) // tile_size - pos_y)
+        if layer == DARK_LAYER:
+            tiles = grid.iter_rect(*rect)
+        else:
+            tiles = grid.iter_layer(layer, *rect)
+
+        surf = None
+        run = None
+        for tx, ty, cell in tiles:
+            _, variant, _, flags = cell
+            x = (tx + pos_x) * tile_size - left
+            y = (ty + pos_y) * tile_size - top
+
+            if layer == DARK_LAYER:
+                if variant != VARIANT_DARK and not flags & FLAG_DARK:
+                    continue
+                if surf is None:
+                    surf = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
+
+                # Neighbouring dark cells on a row are filled with one rect
+                if run is not None and run[1] == y and run[0] + run[2] == x:
+                    run[2] += tile_size
+                else:
+                    if run is not None:
+                        pygame.draw.rect(surf, (0, 0, 0), (run[0], run[1], run[2], tile_size))
+                    run = [x, y, tile_size]
+                continue
+
+            img = tilemap.tile_image(cell)
+            if img is None:
+                continue
+
+            if surf is None:
+                surf = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
+            surf.blit(self.premultiply(img), (x, y), special_flags=pygame.BLEND_PREMULTIPLIED)
+
+        if run is not None:
+            pygame.draw.rect(surf, (0, 0, 0), (run[0], run[1], run[2], tile_size))
+
+        return surf
+
+    def bounds(self):
+        # World pixel rect covered by the map's tiles, including oversized images
+        if self.rect is None:
+            tilemap = self.tilemap
+            min_x, min_y, max_x, max_y = tilemap.grid.extent()
+            self.rect = pygame.Rect((min_x + int(tilemap.pos.x)) * tilemap.tile_size,
+                                    (min_y + int(tilemap.pos.y)) * tilemap.tile_size,
+                                    (max_x - min_x + 1) * tilemap.tile_size + self.max_tile_span(),
+                                    (max_y - min_y + 1) * tilemap.tile_size + self.max_tile_span())
+        return self.rect
+
+    def draw(self, surface, camera_offset, layer, camera=None):
+        view = pygame.Rect(int(camera_offset[0]), int(camera_offset[1]), *surface.get_size())
+        bounds = self.bounds()
+        visible = view.clip(bounds)
+        if not visible.width or not visible.height:
+            if camera is not None:
+                cx0, cy0, cx1, cy1 = self.chunk_range(bounds)
+                camera.record("chunks", 0, (cx1 - cx0 + 1) * (cy1 - cy0 + 1))
+            return
+
+        cx0, cy0, cx1, cy1 = self.chunk_range(visible)
+        drawn = 0
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                chunk = self.get(layer, cx, cy)
+                if chunk is not None:
+                    surface.blit(chunk, (int(cx * self.chunk_size - camera_offset[0]),
+                                         int(cy * self.chunk_size - camera_offset[1])),
+                                 special_flags=pygame.BLEND_PREMULTIPLIED)
+                    drawn += 1
+
+        if camera is not None:
+            bx0, by0, bx1, by1 = self.chunk_range(bounds)
+            camera.record("chunks", drawn, (bx1 - bx0 + 1) * (by1 - by0 + 1) - drawn)
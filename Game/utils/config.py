@@ -1,8 +1,87 @@
 import json
+import os
+import time
+from types import MappingProxyType
 
 path = 'Game/config.json'
+CHECK_INTERVAL = 1.0
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Config:
+    # config.json parsed once and handed out read only. poll() looks at the
+    # file's mtime at most every interval seconds and reloads it when it
+    # changed, subscribers are then called with the config.
+    def __init__(self, path, interval=CHECK_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.data = None
+        self.mtime = None
+        self.checked = 0.0
+        self.subscribers = []
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, 'r') as f:
+            self.data = freeze(json.load(f))
+        self.mtime = mtime
+        self.checked = time.monotonic()
+
+    def values(self):
+        if self.data is None:
+            self.load()
+        return self.data
+
+    def get(self, *keys, default=None):
+        # config.get("debug", "show_sensors", default=False)
+        value = self.values()
+        for key in keys:
+            if not isinstance(value, MappingProxyType) or key not in value:
+                return default
+            value = value[key]
+        return value
+
+    def __getitem__(self, key):
+        return self.values()[key]
+
+    def debug(self, name):
+        return bool(self.get("debug", name, default=False))
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def poll(self):
+        now = time.monotonic()
+        if self.data is None or now - self.checked < self.interval:
+            return False
+        self.checked = now
+
+        try:
+            if os.stat(self.path).st_mtime == self.mtime:
+                return False
+            self.load()
+        except (OSError, ValueError):
+            # half written by an editor, the old values stay until it parses
+            return False
+
+        for callback in list(self.subscribers):
+            callback(self)
+        return True
+
+
+config = Config(path)
+
 
 def get_config():
-    with open(path, 'r') as f:
-        config = json.load(f)
-    return config
\ No newline at end of file
+    return config.values()
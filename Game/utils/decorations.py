@@ -0,0 +1,147 @@
+import os
+
+import pygame
+
+from Game.utils.assets import assets, surface_size
+from Game.utils.bake import bake_path, decode_bake, frame_files, write_bake
+from Game.utils.utils import BASE_IMG_PATH
+
+DECORATION_PATH = "plants/"
+FPS = 30
+SCALE = 0.25
+
+
+class FrameSequence:
+    # The frames of one animated decoration, loaded once per (name, scale) and
+    # shared by every instance. Frames are cropped to the area any frame of the
+    # sequence draws on.
+    def __init__(self, name, frames):
+        self.name = name
+        self.frames = frames
+        self.size = frames[0].get_size() if frames else (0, 0)
+
+
+def decode_sequence(name, scale):
+    # Reads the baked frames, or builds and bakes them from the PNGs. Never
+    # touches the display or the AssetManager, so it is safe on a worker thread.
+    folder = BASE_IMG_PATH + DECORATION_PATH + name
+    path = bake_path(folder, {"sequence": name, "scale": scale})
+
+    baked = decode_bake(path)
+    if baked is not None:
+        return [img for _, img in baked[0]]
+
+    images = [pygame.image.load(os.path.join(folder, file)) for file in frame_files(folder)]
+    if not images:
+        return []
+
+    crop = images[0].get_bounding_rect().unionall([img.get_bounding_rect() for img in images[1:]])
+    size = (max(1, int(crop.width * scale)), max(1, int(crop.height * scale)))
+    frames = [pygame.transform.scale(img.subsurface(crop), size) for img in images]
+
+    try:
+        write_bake(path, list(enumerate(frames)), {})
+    except OSError:
+        pass
+    return frames
+
+
+def decode_decorations(layers):
+    # {(name, scale): frames} for every sequence the decoration layers use
+    # that isn't loaded yet, run by the level worker next to load_level
+    frames = {}
+    for layer in layers:
+        if layer['type'] != 'decorations':
+            continue
+        for decoration in layer['data']:
+            key = (decoration['type'], decoration.get('scale', SCALE))
+            if key not in frames and sequence_key(*key) not in assets.entries:
+                frames[key] = decode_sequence(*key)
+    return frames
+
+
+def sequence_key(name, scale):
+    return "sequence", name, scale
+
+
+def sequence_size(seq):
+    return sum(surface_size(img) for img in seq.frames)
+
+
+def finish_sequence(name, frames):
+    return FrameSequence(name, [img.convert_alpha() for img in frames])
+
+
+def put_sequences(frames):
+    # Hands sequences decoded by decode_decorations to the AssetManager,
+    # main thread only
+    for (name, scale), images in frames.items():
+        assets.put(sequence_key(name, scale), finish_sequence(name, images), sequence_size)
+
+
+def sequence(name, scale):
+    return assets.get(sequence_key(name, scale), lambda: finish_sequence(name, decode_sequence(name, scale)),
+                      sequence_size)
+
+
+class Decoration:
+    # One placed decoration, only a position and a phase, the frames live in
+    # the shared FrameSequence
+    __slots__ = ("rect", "phase", "fps")
+
+    def __init__(self, rect, phase, fps):
+        self.rect = rect
+        self.phase = phase
+        self.fps = fps
+
+
+class DecorationLayer:
+    # Animated decorations of a TileMap, grouped by FrameSequence. Frames are
+    # derived from the layer clock when drawn, so instances off screen cost
+    # nothing per frame, and each sequence is drawn with a single blits() call.
+    def __init__(self):
+        self.groups = {}
+        self.time = 0.0
+
+    def clear(self):
+        self.groups.clear()
+        self.time = 0.0
+
+    def add(self, name, midbottom, scale=SCALE, phase=0, fps=FPS):
+        seq = sequence(name, scale)
+        if not seq.frames:
+            return None
+        rect = pygame.Rect((0, 0), seq.size)
+        rect.midbottom = midbottom
+        decoration = Decoration(rect, phase, fps)
+        self.groups.setdefault(seq, []).append(decoration)
+        return decoration
+
+    def __len__(self):
+        return sum(len(group) for group in self.groups.values())
+
+    def update(self, dt):
+        self.time += dt
+
+    def draw(self, surface, offset, camera=None):
+        view = camera.view_rect() if camera is not None else surface.get_rect().move(int(offset[0]), int(offset[1]))
+        ox, oy = int(offset[0]), int(offset[1])
+        drawn = 0
+        total = 0
+
+        for seq, group in self.groups.items():
+            frames = seq.frames
+            count = len(frames)
+            batch = []
+            for decoration in group:
+                if not view.colliderect(decoration.rect):
+                    continue
+                frame = (int(self.time * decoration.fps) + decoration.phase) % count
+                batch.append((frames[frame], (decoration.rect.x - ox, decoration.rect.y - oy)))
+            if batch:
+                surface.blits(batch, doreturn=False)
+            drawn += len(batch)
+            total += len(group)
+
+        if camera is not None:
+            camera.record("decorations", drawn, total - drawn)
@@ -0,0 +1,185 @@
+import random
+
+# name: frames (an image or a sheet of the heart assets), ticks each frame is
+# shown, extra ticks the animation lasts past its frames (blank when positive,
+# cut short when negative), the animation that follows it and the image shown
+# while the tick is still negative. Animations without a next one hold their
+# last frame.
+HEART_ANIMATIONS = {
+    "full": {"frames": "full"},
+    "startup_half": {"frames": "half"},
+    "startup_empty": {"frames": "half", "before": "empty", "next": "startup_half"},
+    "blink": {"frames": "blink", "hold": 5, "extra": 1, "next": "full"},
+    "shine": {"frames": "shine", "hold": 5, "extra": -1, "next": "full"},
+}
+
+FULL = "full"
+EMPTY = "empty"
+HIDDEN = "hidden"
+
+SPACING = 20
+STARTUP_DELAY = 0.5
+
+
+class HeartAnimation:
+    # One entry of HEART_ANIMATIONS with its frame table, one image per tick
+    __slots__ = ("name", "table", "before", "next", "end")
+
+    def __init__(self, name, table, before, next):
+        self.name = name
+        self.table = table
+        self.before = before
+        self.next = next
+        self.end = len(table)
+
+    def image(self, tick):
+        if tick < 0:
+            return self.before
+        if tick < self.end:
+            return self.table[tick]
+        return self.table[-1]
+
+
+def build_animations(images, spec=HEART_ANIMATIONS):
+    # images: {name: surface or list of surfaces}, already at heart size
+    animations = {}
+    for name, entry in spec.items():
+        frames = images[entry["frames"]]
+        if not isinstance(frames, list):
+            frames = [frames]
+        table = [img for img in frames for _ in range(entry.get("hold", 1))]
+        extra = entry.get("extra", 0)
+        if extra > 0:
+            table += [None] * extra
+        elif extra < 0:
+            table = table[:extra]
+        before = images[entry["before"]] if "before" in entry else None
+        animations[name] = HeartAnimation(name, tuple(table), before, entry.get("next"))
+    for animation in animations.values():
+        if animation.next is not None:
+            animation.next = animations[animation.next]
+    return animations
+
+
+class Heart:
+    __slots__ = ("pos", "state", "animation", "tick", "shine_timer", "drawn")
+
+    def __init__(self, pos, state, animation, tick, shine_timer):
+        self.pos = pos
+        self.state = state
+        self.animation = animation
+        self.tick = tick
+        self.shine_timer = shine_timer
+        self.drawn = None
+
+
+class HeartRow:
+    # The row of hearts of the HUD as a list of slotted Hearts. Health changes
+    # pick animations, advance() moves every full heart one tick along its
+    # frame table and switches to the next animation at its end.
+    def __init__(self, images, count, shown, pos=(20, 12), shine_interval=3.0):
+        self.animations = build_animations(images)
+        self.empty = images[EMPTY]
+        self.pos = pos
+        self.shine_interval = shine_interval
+        self.hearts = []
+        self.health = 0
+        self.grow(count, shown)
+
+    def __len__(self):
+        return len(self.hearts)
+
+    def grow(self, count, shown=None):
+        # hearts fill up one after another once the game starts
+        while len(self.hearts) < count:
+            index = len(self.hearts)
+            state = FULL if shown is None or index < shown else HIDDEN
+            self.hearts.append(Heart((self.pos[0] + index * SPACING, self.pos[1]), state,
+                                     self.animations["startup_empty"],
+                                     -int((STARTUP_DELAY + 0.1 * (index + 1)) * 60),
+                                     random.uniform(0, self.shine_interval)))
+
+    def play(self, heart, name):
+        heart.animation = self.animations[name]
+        heart.tick = 0
+
+    def finish(self, heart):
+        animation = heart.animation
+        if animation.next is not None and heart.tick >= animation.end:
+            heart.animation = animation.next
+            heart.tick = 0
+
+    def update(self, dt, health, max_health):
+        self.grow(max_health)
+        for index, heart in enumerate(self.hearts):
+            if index < max_health:
+                if index < health:
+                    if heart.state != FULL:
+                        heart.state = FULL
+                        self.play(heart, "blink")
+                else:
+                    heart.state = EMPTY
+                    self.play(heart, "full")
+            else:
+                heart.state = HIDDEN
+                self.play(heart, "full")
+
+        for heart in self.hearts:
+            if heart.state != FULL:
+                continue
+            heart.shine_timer -= dt
+            if heart.shine_timer <= 0 and heart.animation.name == "full":
+                self.play(heart, "shine")
+                heart.shine_timer = self.shine_interval + random.uniform(-0.5, 0.5)
+            else:
+                self.finish(heart)
+
+    def advance(self, health, max_health):
+        for heart in self.hearts:
+            if heart.state == FULL:
+                heart.tick += 1
+                self.finish(heart)
+
+        if self.health > health:
+            # took damage, every full heart and the one just lost blink
+            self.health = health
+            for index, heart in enumerate(self.hearts):
+                if heart.state == FULL or health == index + 1:
+                    self.play(heart, "blink")
+
+        hearts = self.hearts
+        count = min(max_health, len(hearts))
+        if not count:
+            return
+        # once the startup reached the last heart the first one lights up,
+        # then each full heart lights up the next
+        startup_half = self.animations["startup_half"]
+        if hearts[count - 1].animation is startup_half and hearts[0].animation is startup_half:
+            self.play(hearts[0], "blink")
+        full = self.animations["full"]
+        for index in range(count - 1):
+            if hearts[index].animation is full and hearts[index + 1].animation is startup_half:
+                self.play(hearts[index + 1], "blink")
+
+    def image(self, heart):
+        # The image a heart shows this frame, None when it shows nothing
+        if heart.state == EMPTY:
+            return self.empty
+        if heart.state != FULL:
+            return None
+        return heart.animation.image(heart.tick)
+
+    def changed(self):
+        # True when any heart shows a different image than when last asked
+        changed = False
+        for heart in self.hearts:
+            image = self.image(heart)
+            if image is not heart.drawn:
+                heart.drawn = image
+                changed = True
+        return changed
+
+    def draw(self, surface):
+        for heart in self.hearts:
+            if heart.drawn is not None:
+                surface.blit(heart.drawn, heart.pos)
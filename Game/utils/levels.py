@@ -0,0 +1,249 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from Game.utils.autotile import autotile
+from Game.utils.tilegrid import TileGrid, Span, encode_variant, FLAG_SOLID, VARIANT_DARK, VARIANT_NONE
+
+# Compiled levels: the tile rules of a level JSON expanded into the TileGrid
+# arrays once and written to CACHE_DIR, later loads mmap the file instead of
+# re-running the expansion. Bump FORMAT_VERSION whenever the layout or the
+# expansion rules change so old caches get rebuilt.
+CACHE_DIR = "Game/cache/levels"
+FORMAT_VERSION = 5
+MAGIC = b"MVLV"
+
+# magic, version, source mtime_ns, source size, source sha1, level bounds
+# (min x, min y, max x, max y, tile size), metadata length
+HEADER = struct.Struct("<4sHqq20s5iI")
+ALIGN = 8
+
+
+def expand_tile_layer(grid, layer, environment):
+    singles = [tile for tile in layer['data'] if "repeat" not in tile["properties"]]
+    if singles:
+        grid.fit(min(int(tile['x']) for tile in singles), min(int(tile['y']) for tile in singles),
+                 max(int(tile['x']) for tile in singles), max(int(tile['y']) for tile in singles))
+
+    for tile in layer['data']:
+        if "repeat" not in tile["properties"]:
+            grid.set_tile(int(tile['x']), int(tile['y']), int(tile['z']), environment, tile["type"], tile["variant"], tile["properties"])
+            continue
+
+        x, y, z = int(tile['x']), int(tile['y']), int(tile['z'])
+        w, h = int(tile["w"]), int(tile["h"])
+        if w <= 0 or h <= 0:
+            continue
+
+        type_id = grid.type_key(environment, tile["type"])
+        alternate = int(tile["alternate"]) if "alternate" in tile["properties"] else 0
+
+        # The repeated cells themselves, alternate columns and a cut last
+        # column keep their properties but are not drawn
+        grid.add_span(Span(x, y, w, h, z, type_id, encode_variant(tile["variant"]),
+                           grid.encode_flags(tile["properties"]),
+                           variant_columns=alternate, cut_last=tile["render_cut"][0] != 0),
+                      overwrite=True)
+
+        # Fill below the drawn columns, starting at the rule's top row
+        if "dark" in tile["properties"]:
+            depth = int(tile["dark_depth"])
+            try:
+                solid = int(tile["solid_depth"])
+            except ValueError:
+                solid = depth
+            if solid <= depth:
+                if depth > 0:
+                    grid.add_span(Span(x, y, w, depth, z, type_id, VARIANT_DARK, 0,
+                                       solid_rows=min(solid + 1, depth), columns=alternate))
+            else:
+                grid.add_span(Span(x, y, w, solid, z, type_id, VARIANT_NONE, FLAG_SOLID, columns=alternate))
+
+        if tile["solid_depth"] and "dark_depth" not in tile["properties"]:
+            solid = int(tile["solid_depth"])
+            if solid > 0:
+                grid.add_span(Span(x, y, w, solid, z, type_id, VARIANT_NONE, FLAG_SOLID))
+
+
+class Level:
+    def __init__(self, width, height, tile_size, environment, grid, layers):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.environment = environment
+        self.grid = grid
+        # every non tile layer (entities, sensors) exactly as in the JSON
+        self.layers = layers
+        # {(name, scale): frames} decoded for the decoration layers, filled
+        # in by the world's level worker
+        self.decoration_frames = {}
+
+
+def parse_level(data):
+    grid = TileGrid()
+    layers = []
+    for layer in data['layers']:
+        if layer['type'] == 'tilelayer':
+            expand_tile_layer(grid, layer, data['environment'])
+        else:
+            layers.append(layer)
+    autotile(grid)
+    return Level(data['width'], data['height'], data['tile_size'], data['environment'], grid, layers)
+
+
+def cache_path(source):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(CACHE_DIR, name + ".lvl")
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def _pad(length):
+    return -length % ALIGN
+
+
+def write_level(level, source, path):
+    grid = level.grid
+    stat = os.stat(source)
+
+    sections = [grid.type_id.tobytes(), grid.variant.tobytes(), grid.z.tobytes(),
+                grid.flags.tobytes(), bytes(grid.solid_mask)]
+    meta = {
+        "width": level.width,
+        "height": level.height,
+        "tile_size": level.tile_size,
+        "environment": level.environment,
+        "layers": level.layers,
+        "grid": {
+            "origin": [grid.origin_x, grid.origin_y],
+            "size": [grid.width, grid.height],
+            "types": grid.types[1:],
+            "flag_names": grid.flag_names,
+            "count": grid.count,
+            "sections": [len(section) for section in sections],
+            "spans": [span.to_list() for span in grid.spans],
+            "holes": sorted(grid.holes),
+        },
+    }
+    meta_bytes = json.dumps(meta).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, stat.st_mtime_ns, stat.st_size, file_hash(source),
+                            *bounds_of(level), len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(bytes(_pad(HEADER.size + len(meta_bytes))))
+        for section in sections:
+            f.write(section)
+            f.write(bytes(_pad(len(section))))
+    os.replace(tmp, path)
+
+
+def is_fresh(path, source):
+    # mtime and size are enough when they match, otherwise fall back to the
+    # content hash so a touched but unchanged file keeps its cache
+    return read_header(path, source) is not None
+
+
+def read_header(path, source):
+    # The header fields of a fresh cache, None when it is missing or stale
+    try:
+        with open(path, 'r+b') as f:
+            header = HEADER.unpack(f.read(HEADER.size))
+            magic, version, mtime_ns, size, digest = header[:5]
+            if magic != MAGIC or version != FORMAT_VERSION:
+                return None
+
+            stat = os.stat(source)
+            if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+                return header
+            if file_hash(source) != digest:
+                return None
+
+            f.seek(0)
+            f.write(HEADER.pack(magic, version, stat.st_mtime_ns, stat.st_size, digest, *header[5:]))
+            return header
+    except (OSError, struct.error):
+        return None
+
+
+def read_level(path):
+    with open(path, 'rb') as f:
+        # ACCESS_COPY keeps the mapping private, tiles can be edited in memory
+        # without touching the cache file
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    view = memoryview(buffer)
+    meta_length = HEADER.unpack_from(view)[-1]
+    offset = HEADER.size
+    meta = json.loads(bytes(view[offset:offset + meta_length]))
+    offset += meta_length + _pad(HEADER.size + meta_length)
+
+    sections = []
+    for length in meta["grid"]["sections"]:
+        sections.append(view[offset:offset + length])
+        offset += length + _pad(length)
+
+    grid_meta = meta["grid"]
+    type_id, variant, z, flags, solid_mask = sections
+    grid = TileGrid.from_buffers(
+        tuple(grid_meta["origin"]), tuple(grid_meta["size"]),
+        [tuple(t) for t in grid_meta["types"]], grid_meta["flag_names"], grid_meta["count"],
+        type_id.cast('H'), variant.cast('h'), z.cast('b'), flags.cast('H'), solid_mask,
+        spans=[Span.from_list(values) for values in grid_meta["spans"]],
+        holes=[tuple(hole) for hole in grid_meta["holes"]],
+    )
+    grid.buffer = buffer
+
+    return Level(meta["width"], meta["height"], meta["tile_size"], meta["environment"], grid, meta["layers"])
+
+
+def compile_level(source, path=None):
+    path = path or cache_path(source)
+    with open(source, 'r') as f:
+        level = parse_level(json.load(f))
+    write_level(level, source, path)
+    return level
+
+
+def load_level(source):
+    path = cache_path(source)
+    if is_fresh(path, source):
+        try:
+            return read_level(path)
+        except (OSError, ValueError, KeyError, struct.error):
+            pass
+
+    try:
+        return compile_level(source, path)
+    except OSError:
+        # cache dir not writable, still load the level from the JSON
+        with open(source, 'r') as f:
+            return parse_level(json.load(f))
+
+
+def bounds_of(level):
+    # Inclusive tile rect a level covers, local to the level, and its tile size
+    min_x, min_y, max_x, max_y = level.grid.extent()
+    return (min(min_x, 0), min(min_y, 0),
+            max(max_x, level.width - 1), max(max_y, level.height - 1), level.tile_size)
+
+
+def cached_bounds(source):
+    # bounds_of() from the header of a compiled level, None when the level
+    # has to be compiled first
+    header = read_header(cache_path(source), source)
+    return header[5:10] if header is not None else None
+
+
+def level_bounds(source):
+    bounds = cached_bounds(source)
+    if bounds is None:
+        bounds = bounds_of(load_level(source))
+    return bounds
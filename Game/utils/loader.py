@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from Game.utils.assets import assets, bake_size, surface_size
+from Game.utils.bake import bake_path, decode_bake, finish_bake
+from Game.utils.utils import BASE_IMG_PATH, SpriteSheet
+
+WORKERS = 4
+
+
+class Loader:
+    # Decodes image files and sprite sheet bakes on a thread pool and puts the
+    # results into the AssetManager, so the load_image / SpriteSheet calls that
+    # follow are cache hits. Only the convert step runs on the main thread.
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.jobs = []
+        self.stats = {}
+        self.pool = None
+        self.pending = []
+
+    def add(self, name, decode, finish):
+        self.jobs.append((name, decode, finish))
+
+    def add_image(self, path, colorkey=None, size=None):
+        key = assets.image_key(path, colorkey, size)
+        if key in assets.entries:
+            return
+        self.add(path, lambda: assets.decode_image(path, size),
+                 lambda img: assets.put(key, assets.finish_image(img, path, colorkey), surface_size))
+
+    def add_sheet(self, path, **options):
+        # Reads the bake when there is one, otherwise decodes the sheet image
+        colorkey = options.get("colorkey")
+
+        source = BASE_IMG_PATH + path
+        sheet_options = SpriteSheet.options(**options)
+        # nothing to load when the sheet's bake or image is already cached
+        entry = assets.entries.get(assets.bake_path_key(source, sheet_options))
+        if entry is not None and ("bake", entry[0]) in assets.entries:
+            return
+        if assets.image_key(path, colorkey) in assets.entries:
+            return
+
+        def decode():
+            bake = bake_path(source, sheet_options)
+            baked = decode_bake(bake)
+            if baked is None:
+                return bake, None, assets.decode_image(path)
+            return bake, baked, None
+
+        def finish(result):
+            bake, baked, img = result
+            assets.put(assets.bake_path_key(source, sheet_options), bake, lambda value: 0)
+            if baked is not None:
+                assets.put(("bake", bake), finish_bake(baked), bake_size)
+            else:
+                assets.put(assets.image_key(path, colorkey), assets.finish_image(img, path, colorkey), surface_size)
+
+        self.add(path, decode, finish)
+
+    def run(self, progress=None):
+        # progress(done, total, name) is called on the main thread after each
+        # file, e.g. to draw a loading screen
+        jobs, self.jobs = self.jobs, []
+        total = len(jobs)
+
+        def timed(decode):
+            start = time.perf_counter()
+            return decode(), time.perf_counter() - start
+
+        start = time.perf_counter()
+        busy = 0.0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="asset-loader") as pool:
+            futures = {pool.submit(timed, decode): (name, finish) for name, decode, finish in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                name, finish = futures[future]
+                result, decode_time = future.result()
+                finish_start = time.perf_counter()
+                finish(result)
+                busy += decode_time + time.perf_counter() - finish_start
+                if progress is not None:
+                    progress(done, total, name)
+
+        wall = time.perf_counter() - start
+        # busy adds up the time of every file, roughly what loading them one
+        # after another costs. Decoders slowed down by each other count extra,
+        # so saved is an upper bound.
+        self.stats = {"files": total, "wall": wall, "busy": busy, "saved": busy - wall}
+        return self.stats
+
+    def start(self):
+        # Background variant of run(): jobs are decoded in the order they were
+        # added and poll() finishes the done ones, call it once per frame
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asset-prefetch")
+        for name, decode, finish in self.jobs:
+            self.pending.append((self.pool.submit(decode), finish))
+        self.jobs = []
+
+    def poll(self):
+        if not self.pending:
+            return False
+        while self.pending and self.pending[0][0].done():
+            future, finish = self.pending.pop(0)
+            finish(future.result())
+        if not self.pending:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+        return True
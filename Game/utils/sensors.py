@@ -0,0 +1,151 @@
+import pygame
+
+
+class RenderAction:
+    def __init__(self, map_name):
+        self.map_name = map_name
+
+    def run(self, game):
+        game.world.require(self.map_name)
+        game.tilemap_current = self.map_name
+        game.tilemap = game.tilemaps[self.map_name]
+        game.tilemaps[self.map_name].rendered = True
+
+
+class DerenderAction:
+    def __init__(self, map_name):
+        self.map_name = map_name
+
+    def run(self, game):
+        game.world.require(self.map_name)
+        game.tilemap_current = self.map_name
+        game.tilemap = game.tilemaps[self.map_name]
+        game.tilemaps[self.map_name].rendered = False
+
+
+class ToggleRenderAction:
+    def __init__(self, map_name):
+        self.map_name = map_name
+
+    def run(self, game):
+        game.world.require(self.map_name)
+        tilemap = game.tilemaps[self.map_name]
+        tilemap.rendered = not tilemap.rendered
+
+        # The first rendered map becomes the current one
+        for name, tilemap in game.tilemaps.items():
+            if tilemap.rendered:
+                game.tilemap_current = name
+                game.tilemap = tilemap
+                break
+
+
+class TransitionAction:
+    # Runs action while a transition has the screen covered
+    def __init__(self, action, effect, duration):
+        self.action = action
+        self.effect = effect
+        self.duration = duration
+
+    def run(self, game):
+        game.transitions.swap(self.effect, lambda: self.action.run(game), self.duration)
+
+
+def compile_transition(properties, actions):
+    # "transition:iris" or "transition:fade:1.5" plays the actions behind a
+    # transition, the duration is in seconds
+    for prop in properties:
+        if prop.startswith("transition:"):
+            parts = prop.split(":")
+            duration = float(parts[2]) if len(parts) > 2 else 0.6
+            return [TransitionAction(action, parts[1], duration) for action in actions]
+    return actions
+
+
+def compile_action(prop):
+    # "toggle_render:mossy" -> ToggleRenderAction("mossy"), None for unknown properties
+    if "derender" in prop:
+        return DerenderAction(prop.split(":")[1])
+    if "toggle_render" in prop:
+        return ToggleRenderAction(prop.split(":")[1])
+    if "render" in prop:
+        return RenderAction(prop.split(":")[1])
+    return None
+
+
+class Sensor:
+    def __init__(self, sensor_id, stype, x, y, w, h, properties, tile_size):
+        self.id = sensor_id
+        self.type = stype
+        # Position and size in tiles, world space
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.properties = properties
+        self.rect = pygame.Rect(x * tile_size, y * tile_size, w * tile_size, h * tile_size)
+        self.actions = []
+        if stype == "render":
+            self.actions = [action for action in map(compile_action, properties) if action is not None]
+            self.actions = compile_transition(properties, self.actions)
+        self.inside = False
+
+    def enter(self, game):
+        # Only the first action runs for each time the player walks in
+        if self.actions:
+            self.actions[0].run(game)
+
+    def exit(self, game):
+        pass
+
+
+class SensorIndex:
+    # Spatial hash of sensor rects, cell_size in pixels. update() only looks at
+    # the sensors in the cells around the player and at the ones the player is
+    # still inside, so enter/exit fire when the player crosses a sensor edge.
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.active = []
+
+    def clear(self):
+        self.cells.clear()
+        self.active = []
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def add(self, sensor):
+        if not sensor.actions:
+            return
+        cx0, cy0, cx1, cy1 = self.cell_range(sensor.rect)
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                self.cells.setdefault((cx, cy), []).append(sensor)
+
+    def query(self, rect):
+        found = []
+        cx0, cy0, cx1, cy1 = self.cell_range(rect)
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                for sensor in self.cells.get((cx, cy), ()):
+                    if sensor not in found and sensor.rect.colliderect(rect):
+                        found.append(sensor)
+        return found
+
+    def update(self, game, rect):
+        touching = self.query(rect)
+
+        for sensor in self.active:
+            if sensor not in touching:
+                sensor.inside = False
+                sensor.exit(game)
+
+        for sensor in touching:
+            if not sensor.inside:
+                sensor.inside = True
+                sensor.enter(game)
+
+        self.active = touching
@@ -25,9 +25,19 @@ class SpriteGroup:
     def empty(self):
         self.sprite_dict.clear()
 
-    def draw(self, surface, offset):
+    def draw(self, surface, offset, camera=None):
+        if camera is None:
+            for sprite in self.sprite_dict.values():
+                sprite.draw(surface, offset)
+            return
+
+        view = camera.view_rect()
+        drawn = 0
         for sprite in self.sprite_dict.values():
-            sprite.draw(surface, offset)
+            if view.colliderect(sprite.rect):
+                sprite.draw(surface, offset)
+                drawn += 1
+        camera.record("sprites", drawn, len(self.sprite_dict) - drawn)
 
     def update(self, dt):
         for sprite in list(self.sprite_dict.values()):
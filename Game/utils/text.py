@@ -0,0 +1,85 @@
+from collections import OrderedDict
+
+import pygame
+
+CAPACITY = 256
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (font, text, color, scale), the least
+    # recently used ones are dropped past capacity. The surfaces are shared,
+    # don't draw on them.
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color, scale=1):
+        key = (font, text, color, scale)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = font.render(text, True, color)
+        if scale != 1:
+            surface = pygame.transform.scale(surface, (surface.get_width() * scale, surface.get_height() * scale))
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class GlyphAtlas:
+    # For text that changes often, like counters: every character is rendered
+    # once into one atlas surface and a string is drawn as one blits() call.
+    # The blit list is only rebuilt when the value or position changes.
+    def __init__(self, font, color, chars="0123456789"):
+        self.font = font
+        self.color = color
+        self.chars = ""
+        self.atlas = None
+        self.areas = {}
+        self.advances = {}
+        self.value = None
+        self.pos = None
+        self.batch = []
+        self.build(chars)
+
+    def build(self, chars):
+        self.chars = "".join(sorted(set(self.chars + chars)))
+        glyphs = [self.font.render(char, True, self.color) for char in self.chars]
+        width = sum(glyph.get_width() for glyph in glyphs)
+        self.atlas = pygame.Surface((max(1, width), self.font.get_height()), pygame.SRCALPHA)
+        self.areas = {}
+        self.advances = {}
+        x = 0
+        for char, glyph, metrics in zip(self.chars, glyphs, self.font.metrics(self.chars)):
+            self.atlas.blit(glyph, (x, 0))
+            self.areas[char] = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            # glyphs can reach past their advance into the next one
+            self.advances[char] = metrics[4] if metrics is not None else glyph.get_width()
+            x += glyph.get_width()
+
+    def layout(self, text, pos):
+        missing = "".join(char for char in text if char not in self.areas)
+        if missing:
+            self.build(missing)
+        x, y = pos
+        self.batch = []
+        for char in text:
+            area = self.areas[char]
+            self.batch.append((self.atlas, (x, y), area))
+            x += self.advances[char]
+
+    def draw(self, surface, value, pos):
+        if value != self.value or pos != self.pos:
+            self.layout(str(value), pos)
+            self.value = value
+            self.pos = pos
+        surface.blits(self.batch, doreturn=False)
+
+
+text_cache = TextCache()
@@ -0,0 +1,462 @@
+from array import array
+from collections.abc import Mapping
+
+VARIANT_NONE = -1
+VARIANT_DARK = -2
+
+# Bits for the property flags array, "solid" and "dark" are fixed because the
+# physics and render code test them directly. Any other property a level uses
+# gets the next free bit the first time it is seen.
+FLAG_SOLID = 1 << 0
+FLAG_DARK = 1 << 1
+MAX_FLAGS = 16
+
+# Spans that overwrite (the cells of a repeat rule) always beat spans that only
+# fill empty cells (dark_depth / solid_depth), see TileGrid.add_span
+SPAN_PRIORITY = 1 << 20
+
+
+def encode_variant(variant):
+    if variant is None:
+        return VARIANT_NONE
+    if variant == "dark":
+        return VARIANT_DARK
+    return int(variant)
+
+
+def decode_variant(value):
+    if value == VARIANT_NONE:
+        return None
+    if value == VARIANT_DARK:
+        return "dark"
+    return value
+
+
+class Span:
+    # A w x h rectangle of identical tiles stored as one record.
+    # columns: alternate mask, columns with (dx & columns) != 0 are not covered
+    # variant_columns: same mask but the column is covered with no variant
+    # cut_last: the last column is covered with no variant
+    # solid_rows: leading rows that are solid on top of flags
+    __slots__ = ("x", "y", "w", "h", "z", "type_id", "variant", "flags",
+                 "solid_rows", "columns", "variant_columns", "cut_last", "priority")
+
+    def __init__(self, x, y, w, h, z, type_id, variant, flags, solid_rows=0,
+                 columns=0, variant_columns=0, cut_last=False, priority=0):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.z = z
+        self.type_id = type_id
+        self.variant = variant
+        self.flags = flags
+        self.solid_rows = solid_rows
+        self.columns = columns
+        self.variant_columns = variant_columns
+        self.cut_last = cut_last
+        self.priority = priority
+
+    def covers(self, x, y):
+        dx = x - self.x
+        return 0 <= dx < self.w and 0 <= y - self.y < self.h and not dx & self.columns
+
+    def cell(self, x, y):
+        dx = x - self.x
+        variant = self.variant
+        if dx & self.variant_columns or (self.cut_last and dx == self.w - 1):
+            variant = VARIANT_NONE
+        flags = self.flags
+        if y - self.y < self.solid_rows:
+            flags |= FLAG_SOLID
+        return self.type_id, variant, self.z, flags
+
+    def to_list(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+class TileGrid:
+    # Dense arrays hold single tiles, repeated rectangles live in spans. A cell
+    # in the arrays always wins over the spans under it.
+    def __init__(self, origin=(0, 0), size=(0, 0)):
+        self.origin_x, self.origin_y = origin
+        self.width, self.height = size
+
+        # type id 0 is an empty cell, every other id indexes (environment, type)
+        self.types = [None]
+        self.type_ids = {}
+        self.flag_names = {"solid": FLAG_SOLID, "dark": FLAG_DARK}
+
+        self.count = 0
+        self._allocate()
+
+        self.spans = []
+        self.span_rows = {}
+        self.span_layers = {}
+        self.span_order = 0
+        # span cells removed at runtime
+        self.holes = set()
+
+        # z -> {y: set of x} for the dense cells, built on first use
+        self.layers = None
+
+    @classmethod
+    def from_buffers(cls, origin, size, types, flag_names, count, type_id, variant, z, flags, solid_mask,
+                     spans=(), holes=()):
+        # Wraps existing buffers (e.g. memoryviews of a compiled level) without copying
+        grid = cls.__new__(cls)
+        grid.origin_x, grid.origin_y = origin
+        grid.width, grid.height = size
+        grid.types = [None] + list(types)
+        grid.type_ids = {key: idx for idx, key in enumerate(grid.types) if key is not None}
+        grid.flag_names = dict(flag_names)
+        grid.count = count
+        grid.type_id = type_id
+        grid.variant = variant
+        grid.z = z
+        grid.flags = flags
+        grid.solid_mask = solid_mask
+
+        grid.spans = []
+        grid.span_rows = {}
+        grid.span_layers = {}
+        grid.span_order = len(spans)
+        grid.holes = set(holes)
+        grid.layers = None
+        for span in spans:
+            grid._index_span(span)
+        return grid
+
+    def _allocate(self):
+        cells = self.width * self.height
+        self.type_id = array('H', bytes(2 * cells))
+        self.variant = array('h', [VARIANT_NONE]) * cells
+        self.z = array('b', bytes(cells))
+        self.flags = array('H', bytes(2 * cells))
+        self.solid_mask = bytearray((cells + 7) // 8)
+
+    def in_bounds(self, x, y):
+        return (0 <= x - self.origin_x < self.width and
+                0 <= y - self.origin_y < self.height)
+
+    def index(self, x, y):
+        gx = x - self.origin_x
+        gy = y - self.origin_y
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            return gy * self.width + gx
+        return -1
+
+    def coords(self, idx):
+        gy, gx = divmod(idx, self.width)
+        return gx + self.origin_x, gy + self.origin_y
+
+    def extent(self):
+        # Inclusive tile rect covering the arrays and every span
+        rects = [(s.x, s.y, s.x + s.w - 1, s.y + s.h - 1) for s in self.spans]
+        if self.width and self.height:
+            rects.append((self.origin_x, self.origin_y,
+                          self.origin_x + self.width - 1, self.origin_y + self.height - 1))
+        if not rects:
+            return 0, 0, -1, -1
+        return (min(r[0] for r in rects), min(r[1] for r in rects),
+                max(r[2] for r in rects), max(r[3] for r in rects))
+
+    def type_key(self, environment, ttype):
+        key = (environment, ttype)
+        type_id = self.type_ids.get(key)
+        if type_id is None:
+            type_id = len(self.types)
+            self.types.append(key)
+            self.type_ids[key] = type_id
+        return type_id
+
+    def encode_flags(self, properties):
+        flags = 0
+        for prop in properties or []:
+            bit = self.flag_names.get(prop)
+            if bit is None:
+                # flags is a 16 bit array, a dropped property would go unnoticed
+                if len(self.flag_names) >= MAX_FLAGS:
+                    raise ValueError(f"tile property {prop!r} doesn't fit, a map can use at most "
+                                     f"{MAX_FLAGS} different properties")
+                bit = 1 << len(self.flag_names)
+                self.flag_names[prop] = bit
+            flags |= bit
+        return flags
+
+    def decode_flags(self, flags):
+        return [name for name, bit in self.flag_names.items() if flags & bit]
+
+    def _layer_index(self):
+        if self.layers is None:
+            self.layers = {}
+            z = self.z
+            for x, y, idx in self._dense_cells():
+                self.layers.setdefault(z[idx], {}).setdefault(y, set()).add(x)
+        return self.layers
+
+    def _layer_add(self, z, x, y):
+        if self.layers is not None:
+            self.layers.setdefault(z, {}).setdefault(y, set()).add(x)
+
+    def _layer_discard(self, z, x, y):
+        if self.layers is None:
+            return
+        row = self.layers.get(z, {}).get(y)
+        if row is not None:
+            row.discard(x)
+
+    def layer_ids(self):
+        return sorted(set(self._layer_index()) | set(self.span_layers))
+
+    def fit(self, min_x, min_y, max_x, max_y):
+        # Grow the arrays so the inclusive tile rect fits, keeping existing cells
+        if self.width and self.height:
+            min_x = min(min_x, self.origin_x)
+            min_y = min(min_y, self.origin_y)
+            max_x = max(max_x, self.origin_x + self.width - 1)
+            max_y = max(max_y, self.origin_y + self.height - 1)
+            if (min_x, min_y) == (self.origin_x, self.origin_y) and \
+                    max_x - min_x + 1 == self.width and max_y - min_y + 1 == self.height:
+                return
+
+        old = (self.type_id, self.variant, self.z, self.flags)
+        occupied = list(self._dense_cells())
+
+        self.origin_x, self.origin_y = min_x, min_y
+        self.width = max_x - min_x + 1
+        self.height = max_y - min_y + 1
+        self._allocate()
+
+        type_id, variant, z, flags = old
+        for x, y, old_idx in occupied:
+            idx = self.index(x, y)
+            self.type_id[idx] = type_id[old_idx]
+            self.variant[idx] = variant[old_idx]
+            self.z[idx] = z[old_idx]
+            self.flags[idx] = flags[old_idx]
+            if flags[old_idx] & FLAG_SOLID:
+                self.solid_mask[idx >> 3] |= 1 << (idx & 7)
+
+    def _dense_cells(self):
+        type_id = self.type_id
+        width = self.width
+        for idx in range(len(type_id)):
+            if type_id[idx]:
+                gy, gx = divmod(idx, width)
+                yield gx + self.origin_x, gy + self.origin_y, idx
+
+    def _index_span(self, span):
+        self.spans.append(span)
+        self.span_layers.setdefault(span.z, []).append(span)
+        for y in range(span.y, span.y + span.h):
+            row = self.span_rows.setdefault(y, [])
+            row.append(span)
+            row.sort(key=lambda s: s.priority, reverse=True)
+
+    def add_span(self, span, overwrite=False):
+        # Overwriting spans beat everything added before them, fill spans only
+        # take cells that are still empty, matching the order load rules run in
+        self.span_order += 1
+        if overwrite:
+            span.priority = SPAN_PRIORITY + self.span_order
+            for y in range(span.y, span.y + span.h):
+                for x in range(span.x, span.x + span.w):
+                    self._clear_dense(x, y)
+        else:
+            span.priority = SPAN_PRIORITY - self.span_order
+        self._index_span(span)
+        return span
+
+    def span_at(self, x, y):
+        for span in self.span_rows.get(y, ()):
+            if span.covers(x, y):
+                return span
+        return None
+
+    def cell(self, x, y):
+        # (type_id, variant, z, flags) of the cell or None when it is empty
+        idx = self.index(x, y)
+        if idx >= 0 and self.type_id[idx]:
+            return self.type_id[idx], self.variant[idx], self.z[idx], self.flags[idx]
+        if (x, y) in self.holes:
+            return None
+        span = self.span_at(x, y)
+        if span is None:
+            return None
+        return span.cell(x, y)
+
+    def has_tile(self, x, y):
+        return self.cell(x, y) is not None
+
+    def is_solid(self, x, y):
+        idx = self.index(x, y)
+        if idx >= 0 and self.type_id[idx]:
+            return (self.solid_mask[idx >> 3] >> (idx & 7)) & 1 == 1
+        if not self.span_rows or (x, y) in self.holes:
+            return False
+        span = self.span_at(x, y)
+        return span is not None and bool(span.cell(x, y)[3] & FLAG_SOLID)
+
+    def solids_in(self, left, top, right, bottom):
+        # Solid cells inside the inclusive tile rect
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)
+                if self.is_solid(x, y)]
+
+    def solid_in_span(self, left, right, y):
+        for x in range(left, right + 1):
+            if self.is_solid(x, y):
+                return True
+        return False
+
+    def set_tile(self, x, y, z, environment, ttype, variant, properties):
+        if not self.in_bounds(x, y):
+            self.fit(x, y, x, y)
+        idx = self.index(x, y)
+
+        if self.type_id[idx] == 0:
+            self.count += 1
+        else:
+            self._layer_discard(self.z[idx], x, y)
+        self.holes.discard((x, y))
+        self._layer_add(z, x, y)
+
+        flags = self.encode_flags(properties)
+        self.type_id[idx] = self.type_key(environment, ttype)
+        self.variant[idx] = encode_variant(variant)
+        self.z[idx] = z
+        self.flags[idx] = flags
+        if flags & FLAG_SOLID:
+            self.solid_mask[idx >> 3] |= 1 << (idx & 7)
+        else:
+            self.solid_mask[idx >> 3] &= ~(1 << (idx & 7)) & 0xFF
+        return idx
+
+    def densify(self, x, y):
+        # Copies the span cell at x, y into the arrays so it can be changed on
+        # its own, returns its index or -1 when there is no cell. fit() the
+        # arrays around many cells first, one at a time regrows them each time.
+        idx = self.index(x, y)
+        if idx >= 0 and self.type_id[idx]:
+            return idx
+        cell = self.cell(x, y)
+        if cell is None:
+            return -1
+        if idx < 0:
+            self.fit(x, y, x, y)
+            idx = self.index(x, y)
+
+        type_id, variant, z, flags = cell
+        self.count += 1
+        self._layer_add(z, x, y)
+        self.type_id[idx] = type_id
+        self.variant[idx] = variant
+        self.z[idx] = z
+        self.flags[idx] = flags
+        if flags & FLAG_SOLID:
+            self.solid_mask[idx >> 3] |= 1 << (idx & 7)
+        return idx
+
+    def _clear_dense(self, x, y):
+        idx = self.index(x, y)
+        if idx < 0 or self.type_id[idx] == 0:
+            return False
+        self._layer_discard(self.z[idx], x, y)
+        self.type_id[idx] = 0
+        self.variant[idx] = VARIANT_NONE
+        self.z[idx] = 0
+        self.flags[idx] = 0
+        self.solid_mask[idx >> 3] &= ~(1 << (idx & 7)) & 0xFF
+        self.count -= 1
+        return True
+
+    def remove_tile(self, x, y):
+        removed = self._clear_dense(x, y)
+        if (x, y) not in self.holes and self.span_at(x, y) is not None:
+            self.holes.add((x, y))
+            removed = True
+        return removed
+
+    def iter_rect(self, left, top, right, bottom):
+        min_x, min_y, max_x, max_y = self.extent()
+        for y in range(max(top, min_y), min(bottom, max_y) + 1):
+            for x in range(max(left, min_x), min(right, max_x) + 1):
+                cell = self.cell(x, y)
+                if cell is not None:
+                    yield x, y, cell
+
+    def iter_layer(self, z, left, top, right, bottom):
+        # Like iter_rect but only visits the cells of one z layer, row by row
+        cells = []
+        rows = self._layer_index().get(z, {})
+        for y in range(top, bottom + 1):
+            row = rows.get(y)
+            if not row:
+                continue
+            for x in row:
+                if left <= x <= right:
+                    idx = self.index(x, y)
+                    cells.append((y, x, (self.type_id[idx], self.variant[idx], z, self.flags[idx])))
+
+        for span in self.span_layers.get(z, ()):
+            for y in range(max(top, span.y), min(bottom, span.y + span.h - 1) + 1):
+                for x in range(max(left, span.x), min(right, span.x + span.w - 1) + 1):
+                    if not span.covers(x, y) or (x, y) in self.holes:
+                        continue
+                    idx = self.index(x, y)
+                    if idx >= 0 and self.type_id[idx]:
+                        continue
+                    if self.span_at(x, y) is span:
+                        cells.append((y, x, span.cell(x, y)))
+
+        cells.sort(key=lambda c: (c[0], c[1]))
+        for y, x, cell in cells:
+            yield x, y, cell
+
+    def iter_tiles(self):
+        return self.iter_rect(*self.extent())
+
+    def tile(self, x, y, offset=(0, 0)):
+        # Builds the legacy dict for a single cell, only meant for tooling
+        cell = self.cell(x, y)
+        if cell is None:
+            return None
+        type_id, variant, z, flags = cell
+        environment, ttype = self.types[type_id]
+        return {
+            'x': x + int(offset[0]),
+            'y': y + int(offset[1]),
+            'z': z,
+            'environment': environment,
+            'type': ttype,
+            'variant': decode_variant(variant),
+            'properties': self.decode_flags(flags),
+        }
+
+
+class TileGridView(Mapping):
+    # Read only ``{(x, y): tile_dict}`` view kept for code that still expects
+    # the old dict layout, the dicts are built on access and never stored.
+    def __init__(self, grid, offset):
+        self.grid = grid
+        self.offset = offset
+
+    def __getitem__(self, key):
+        tile = self.grid.tile(*key, offset=self.offset)
+        if tile is None:
+            raise KeyError(key)
+        return tile
+
+    def __contains__(self, key):
+        return self.grid.has_tile(*key)
+
+    def __iter__(self):
+        for x, y, _ in self.grid.iter_tiles():
+            yield x, y
+
+    def __len__(self):
+        return sum(1 for _ in self.grid.iter_tiles())
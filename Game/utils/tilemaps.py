@@ -6,18 +6,12 @@ from Game.Sprites.Enemies.enemy import Enemy
 from Game.Sprites.Inanimate.chest import Chest
 from Game.Sprites.Inanimate.breakable import Breakable
 from Game.utils.spritegroup import SpriteGroup
-
-AUTOTILE_MAP = {
-    tuple(sorted([(1, 0), (0, 1)])): 0,
-    tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
-    tuple(sorted([(-1, 0), (0, 1)])): 2,
-    tuple(sorted([(-1, 0), (0, -1), (0, 1)])): 3,
-    tuple(sorted([(-1, 0), (0, -1)])): 4,
-    tuple(sorted([(-1, 0), (0, -1), (1, 0)])): 5,
-    tuple(sorted([(1, 0), (0, -1)])): 6,
-    tuple(sorted([(1, 0), (0, -1), (0, 1)])): 7,
-    tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8
-}
+from Game.utils.autotile import AUTOTILE_MAP, autotile
+from Game.utils.chunks import ChunkCache, DARK_LAYER
+from Game.utils.decorations import SCALE, DecorationLayer, put_sequences
+from Game.utils.levels import load_level
+from Game.utils.tilegrid import TileGrid, TileGridView, FLAG_DARK, FLAG_SOLID, VARIANT_DARK, VARIANT_NONE
+from Game.utils.sensors import Sensor, SensorIndex
 
 NEIGHBOR_OFFSET = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
 PHYSICS_TILES = ['solid']
@@ -51,333 +45,361 @@ scale_sizing = {
     }
 }
 
+
+class TileImageCache:
+    # Tile images already scaled to their scale_sizing size, keyed by
+    # (environment, type, variant). Built when a map loads so rendering never
+    # scales, invalidate() must be called when game.assets is replaced.
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.images = {}
+        self.built = set()
+
+    def invalidate(self):
+        self.images.clear()
+        self.built.clear()
+
+    def build(self, types):
+        for env, ttype in types:
+            if (env, ttype) in self.built:
+                continue
+            self.built.add((env, ttype))
+
+            try:
+                sheet = self.tilemap.game.assets[env][ttype]
+            except KeyError:
+                continue
+
+            for variant, img in enumerate(sheet.get_images_list()):
+                self.images[(env, ttype, variant)] = self.scale(env, ttype, variant, img).convert_alpha()
+
+    def scale(self, env, ttype, variant, img):
+        tile_size = self.tilemap.tile_size
+        try:
+            return pygame.transform.scale(img, (scale_sizing[env][ttype].get(str(variant), (tile_size, tile_size))))
+        except (TypeError, KeyError):
+            return pygame.transform.scale(img, (tile_size, tile_size))
+
+    def get(self, env, ttype, variant):
+        if (env, ttype) not in self.built:
+            self.build([(env, ttype)])
+        return self.images.get((env, ttype, variant))
+
+
 class TileMap:
     def __init__(self, game, tile_size=48, pos=(0, 0), rendered=False, overlay=None):
         self.game = game
         self.tile_size = tile_size
-        self.tile_map = {}
+        self.grid = TileGrid()
+        self.chunks = ChunkCache(self)
+        self.tile_images = TileImageCache(self)
         self.off_grid_tiles = []
         self.pos = pygame.math.Vector2(*pos)
         self.rendered = rendered
 
         self.sensors = {}
+        self.sensor_index = SensorIndex()
         self.enemies = SpriteGroup()
         self.crystals = SpriteGroup()
         self.items = SpriteGroup()
         self.chests = SpriteGroup()
         self.breakables = SpriteGroup()
+        self.decorations = DecorationLayer()
+
+        # Level entities by (layer name, index). Killed, broken and opened
+        # ones are remembered across unloads so paging the map back in
+        # doesn't bring them back. Items and crystals nobody picked up yet
+        # are kept as (group, sprite) and put back where they were.
+        self.spawned = {}
+        self.removed = set()
+        self.opened = set()
+        self.dropped = []
 
         self.overlay = overlay
 
         self.width = 0
         self.height = 0
         self.tile_size = 0
+        self.environment = None
+        self.loaded = False
 
     def load_map(self, p):
-        with open(p, 'r') as f:
-            data = json.load(f)
+        self.apply_level(load_level(p))
+
+    def apply_level(self, level):
+        # Builds the map from a loaded Level, must run on the main thread
+        self.unload()
+        self.loaded = True
 
-        self.width = data['width']
-        self.height = data['height']
-        self.tile_size = data['tile_size']
+        self.width = level.width
+        self.height = level.height
+        self.tile_size = level.tile_size
+        self.environment = level.environment
+        self.grid = level.grid
+
+        # frames decoded next to the level on the worker, only converted here
+        put_sequences(level.decoration_frames)
+
+        for layer in level.layers:
+            name = layer.get('name', layer['type'])
 
-        for layer in data['layers']:
             if layer['type'] == 'breakables':
-                for breakable in layer['data']:
-                    self.breakables.append(Breakable(image=self.game.assets[data['environment']][breakable["type"]].get_images_list()[breakable["variant"]], pos=(int(breakable['x']) * self.tile_size + self.pos.x * self.tile_size, int(breakable['y']) * self.tile_size + self.pos.y * self.tile_size), tilemap=self, health=3, id=breakable.get("id"), properties=breakable.get("properties", [])))
+                for index, breakable in enumerate(layer['data']):
+                    if (name, index) in self.removed:
+                        continue
+                    self.spawned[(name, index)] = Breakable(image=self.game.assets[self.environment][breakable["type"]].get_images_list()[breakable["variant"]], pos=(int(breakable['x']) * self.tile_size + self.pos.x * self.tile_size, int(breakable['y']) * self.tile_size + self.pos.y * self.tile_size), tilemap=self, health=3, id=breakable.get("id"), properties=breakable.get("properties", []))
+                    self.breakables.append(self.spawned[(name, index)])
 
             if layer['type'] == 'chests':
-                for chest in layer['data']:
-                    self.chests.append(Chest(pos=(int(chest['x']) * self.tile_size + self.pos.x * self.tile_size, int(chest['y']) * self.tile_size + self.pos.y * self.tile_size), game=self.game, tilemap=self, contains=chest["contains"]))
+                for index, chest in enumerate(layer['data']):
+                    self.spawned[(name, index)] = Chest(pos=(int(chest['x']) * self.tile_size + self.pos.x * self.tile_size, int(chest['y']) * self.tile_size + self.pos.y * self.tile_size), game=self.game, tilemap=self, contains=chest["contains"], opened=(name, index) in self.opened)
+                    self.chests.append(self.spawned[(name, index)])
 
             if layer['type'] == 'enemies':
-                for enemy in layer['data']:
+                for index, enemy in enumerate(layer['data']):
+                    if (name, index) in self.removed:
+                        continue
                     enemy_id = enemy.get("id")
                     if enemy_id is not None and "flying" not in enemy["properties"]:
                         enemy_pos = (int(enemy['x']) * self.tile_size + self.pos.x * self.tile_size,
                                    int(enemy['y']) * self.tile_size + self.pos.y * self.tile_size)
                         new_enemy = Enemy(pos=enemy_pos, game=self.game, tilemap=self, drop=enemy["drop"])
+                        self.spawned[(name, index)] = new_enemy
                         self.enemies.append(new_enemy)
 
                     elif "flying" in enemy["properties"]:
-                        self.enemies.append(FlyingEnemy(pos=(int(enemy['x']) * self.tile_size + self.pos.x * self.tile_size, int(enemy['y']) * self.tile_size + self.pos.y * self.tile_size), game=self.game, tilemaps=[self], tilemap=self, move_axis=pygame.Vector2(*enemy["move_axis"]), drop=enemy["drop"]))
+                        self.spawned[(name, index)] = FlyingEnemy(pos=(int(enemy['x']) * self.tile_size + self.pos.x * self.tile_size, int(enemy['y']) * self.tile_size + self.pos.y * self.tile_size), game=self.game, tilemaps=[self], tilemap=self, move_axis=pygame.Vector2(*enemy["move_axis"]), drop=enemy["drop"])
+                        self.enemies.append(self.spawned[(name, index)])
+
+            if layer['type'] == 'decorations':
+                for decoration in layer['data']:
+                    # x, y is the tile the decoration stands in
+                    self.decorations.add(decoration['type'],
+                                         ((decoration['x'] + self.pos.x + 0.5) * self.tile_size,
+                                          (decoration['y'] + self.pos.y + 1) * self.tile_size),
+                                         scale=decoration.get('scale', SCALE),
+                                         phase=decoration.get('phase', 0),
+                                         fps=decoration.get('fps', 30))
 
             if layer['type'] == 'sensor_layer':
                 for sensor in layer['data']:
                     sensor_id = sensor["id"]
                     if sensor_id is not None:
-                        self.sensors[sensor_id] = {
-                            "type": sensor['type'],
-                            'x': float(sensor['x']),
-                            'y': float(sensor['y']),
-                            'w': float(sensor['w']),
-                            'h': float(sensor['h']),
-                            'properties': sensor.get('properties', []),
-                            'triggered': False,
-                            "id": sensor_id
-                        }
-
-            if layer['type'] == 'tilelayer':
-                for tile in layer['data']:
-                    if "repeat" in tile["properties"]:
-                        for x in range(tile["w"]):
-                            for y in range(tile["h"]):
-                                should_render = True
-                                if "alternate" in tile["properties"]:
-                                    should_render = (x & int(tile["alternate"])) == 0
-
-                                world_x = int(tile['x'] + x)
-                                world_y = int(tile['y'] + y)
-                                tile_variant = tile["variant"]
-
-                                if should_render:
-                                    if tile["render_cut"][0] != 0 and x == tile["w"] - 1:
-                                        tile_variant = None
-
-                                    self.tile_map[(world_x, world_y)] = {
-                                        'x': world_x,
-                                        'y': world_y,
-                                        'z': int(tile['z']),
-                                        'environment': data['environment'],
-                                        'type': tile["type"],
-                                        'variant': tile_variant,
-                                        'properties': tile["properties"]
-                                    }
-                                else:
-                                    self.tile_map[(world_x, world_y)] = {
-                                        'x': world_x,
-                                        'y': world_y,
-                                        'z': int(tile['z']),
-                                        'environment': data['environment'],
-                                        'type': tile["type"],
-                                        'variant': None,
-                                        'properties': tile["properties"]
-                                    }
-
-                                if tile_variant is None:
-                                    self.tile_map[(world_x, world_y)] = {
-                                        'x': world_x,
-                                        'y': world_y,
-                                        'z': int(tile['z']),
-                                        'environment': data['environment'],
-                                        'type': tile["type"],
-                                        'variant': None,
-                                        'properties': tile["properties"]
-                                    }
-
-                                if "dark" in tile["properties"] and should_render:
-                                    depth = int(tile["dark_depth"])
-                                    try:
-                                        solid = int(tile["solid_depth"])
-                                    except ValueError:
-                                        solid = depth
-                                    if solid <= depth:
-                                        for y1 in range(depth):
-                                            tile_x = int(tile['x'] + x)
-                                            tile_y = int(tile['y'] + y1)
-                                            if (tile_x, tile_y) not in self.tile_map:
-                                                if y1 <= solid:
-                                                    self.tile_map[(tile_x, tile_y)] = {
-                                                        'x': tile_x,
-                                                        'y': tile_y,
-                                                        'z': int(tile['z']),
-                                                        'environment': data['environment'],
-                                                        'type': tile["type"],
-                                                        'variant': "dark",
-                                                        'properties': ["solid"],
-                                                    }
-                                                else:
-                                                    self.tile_map[(tile_x, tile_y)] = {
-                                                        'x': tile_x,
-                                                        'y': tile_y,
-                                                        'z': int(tile['z']),
-                                                        'environment': data['environment'],
-                                                        'type': tile["type"],
-                                                        'variant': "dark",
-                                                        'properties': [],
-                                                    }
-                                    else:
-                                        for y1 in range(solid):
-                                            tile_x = int(tile['x'] + x)
-                                            tile_y = int(tile['y'] + y1)
-                                            if (tile_x, tile_y) not in self.tile_map:
-                                                if y1 < solid:
-                                                    self.tile_map[(tile_x, tile_y)] = {
-                                                        'x': tile_x,
-                                                        'y': tile_y,
-                                                        'z': int(tile['z']),
-                                                        'environment': data['environment'],
-                                                        'type': tile["type"],
-                                                        'variant': None,
-                                                        'properties': ["solid"],
-                                                    }
-
-                                if tile["solid_depth"] and "dark_depth" not in tile["properties"]:
-                                    solid = int(tile["solid_depth"])
-                                    for y1 in range(solid):
-                                        tile_x = int(tile['x'] + x)
-                                        tile_y = int(tile['y'] + y1)
-                                        if (tile_x, tile_y) not in self.tile_map:
-                                            if y1 < solid:
-                                                self.tile_map[(tile_x, tile_y)] = {
-                                                    'x': tile_x,
-                                                    'y': tile_y,
-                                                    'z': int(tile['z']),
-                                                    'environment': data['environment'],
-                                                    'type': tile["type"],
-                                                    'variant': None,
-                                                    'properties': ["solid"],
-                                                }
-
-                    else:
-                        x, y, z = tile['x'], tile['y'], tile['z']
-                        self.tile_map[(x, y)] = {
-                            'x': int(x),
-                            'y': int(y),
-                            'z': int(z),
-                            'environment': data['environment'],
-                            'type': tile["type"],
-                            'variant': tile["variant"],
-                            'properties': tile["properties"]
-                        }
-
-        for pos, tile in self.tile_map.items():
-            if 'solid' in tile.get('properties', []):
-                pass
-
-        for tile in self.tile_map.values():
-            tile['x'] += int(self.pos.x)
-            tile['y'] += int(self.pos.y)
+                        self.sensors[sensor_id] = Sensor(sensor_id, sensor['type'],
+                                                         float(sensor['x']) + int(self.pos.x),
+                                                         float(sensor['y']) + int(self.pos.y),
+                                                         float(sensor['w']), float(sensor['h']),
+                                                         sensor.get('properties', []), self.tile_size)
+
+        for group, sprite in self.dropped:
+            group.append(sprite)
+        self.dropped = []
 
+        self.sensor_index.clear()
         for sensor in self.sensors.values():
-            sensor['x'] += int(self.pos.x)
-            sensor['y'] += int(self.pos.y)
+            self.sensor_index.add(sensor)
+
+        self.tile_images.invalidate()
+        self.tile_images.build(self.grid.types[1:])
+
+    def unload(self):
+        # Drops everything load_map created, the map can be loaded again later
+        self.remember_entities()
+        self.grid = TileGrid()
+        self.chunks.invalidate()
+        self.tile_images.invalidate()
+        self.sensors = {}
+        self.sensor_index.clear()
+        for group in (self.enemies, self.crystals, self.items, self.chests, self.breakables):
+            group.empty()
+        self.decorations.clear()
+        self.loaded = False
+
+    def remember_entities(self):
+        present = {id(sprite) for group in (self.enemies, self.chests, self.breakables)
+                   for sprite in group.sprite_dict.values()}
+        for key, sprite in self.spawned.items():
+            if getattr(sprite, "opened", False):
+                self.opened.add(key)
+            elif id(sprite) not in present or getattr(sprite, "health", 1) <= 0:
+                self.removed.add(key)
+        self.spawned = {}
+        self.dropped += [(group, sprite) for group in (self.items, self.crystals)
+                         for sprite in group.sprite_dict.values()]
+
+    def memory_size(self):
+        # Rough number of bytes held by the tiles, baked chunks and tile images
+        grid = self.grid
+        size = sum(memoryview(buffer).nbytes for buffer in
+                   (grid.type_id, grid.variant, grid.z, grid.flags, grid.solid_mask))
+        for surf in self.chunks.chunks.values():
+            if surf is not None:
+                size += surf.get_width() * surf.get_height() * surf.get_bytesize()
+        for images in (self.tile_images.images, self.chunks.premultiplied):
+            for img in images.values():
+                size += img.get_width() * img.get_height() * img.get_bytesize()
+        return size
+
+    @property
+    def tile_map(self):
+        return TileGridView(self.grid, (int(self.pos.x), int(self.pos.y)))
 
     def get_tiles_around(self, pos):
         x, y = pos
-        grid_x = x // self.tile_size
-        grid_y = y // self.tile_size
+        grid_x = int(x // self.tile_size)
+        grid_y = int(y // self.tile_size)
 
+        grid = self.grid
         tiles = {}
         for dx, dy in NEIGHBOR_OFFSET:
-            neighbor_pos = (grid_x + dx, grid_y + dy)
-            if neighbor_pos in self.tile_map:
-                neighbor_tile = self.tile_map[neighbor_pos]
-
-                if neighbor_tile.get('variant') is None:
-                    tiles[(dx, dy)] = None
-                    continue
-
-                props = neighbor_tile.get('properties', [])
-                try:
-                    is_solid = ('solid' in props)
-                except TypeError:
-                    is_solid = False
-
-                if is_solid:
-                    tiles[(dx, dy)] = neighbor_tile
-                else:
-                    tiles[(dx, dy)] = None
+            cell = grid.cell(grid_x + dx, grid_y + dy)
+            if cell is not None and cell[3] & FLAG_SOLID and cell[1] != VARIANT_NONE:
+                tiles[(dx, dy)] = cell
             else:
                 tiles[(dx, dy)] = None
         return tiles
 
-    def render(self, surface, camera_offset, layer):
-        camera_offset = pygame.math.Vector2(camera_offset)
-        from Game.utils.config import get_config
-        config = get_config()
-        screen_height = config["resolution"][1]
-        for tile in self.tile_map.values():
-            if tile["variant"] == "dark" or "dark" in tile.get("properties", []):
-                x = tile['x'] * self.tile_size - self.game.camera.offset.x
-                y = (tile['y']) * self.tile_size - self.game.camera.offset.y
-                height = screen_height - y
-                if height > 0:
-                    pygame.draw.rect(surface, (0, 0, 0), (x, y, self.tile_size, self.tile_size))
+    def tile_image(self, cell):
+        type_id, variant, _, _ = cell
+        if variant == VARIANT_NONE or variant == VARIANT_DARK:
+            return None
+
+        env, ttype = self.grid.types[type_id]
+        return self.tile_images.get(env, ttype, variant)
+
+    def reload_assets(self):
+        self.tile_images.invalidate()
+        self.tile_images.build(self.grid.types[1:])
+        self.chunks.invalidate()
+
+    def max_tile_span(self):
+        span = self.tile_size
+        for env, ttype in self.grid.types[1:]:
+            for size in scale_sizing.get(env, {}).get(ttype, {}).values():
+                span = max(span, *size)
+        return span
+
+    def set_tile(self, tx, ty, z, ttype, variant, properties, environment=None):
+        if environment is None:
+            environment = self.environment
+        self.grid.set_tile(tx, ty, z, environment, ttype, variant, properties)
+        self.tile_changed(tx, ty)
+
+    def remove_tile(self, tx, ty):
+        if self.grid.remove_tile(tx, ty):
+            self.tile_changed(tx, ty)
+            return True
+        return False
 
-        self.chests.draw(surface, camera_offset)
+    def breakable_destroyed(self, breakable):
+        # A breakable placed over grid tiles takes them with it, the autotiled
+        # tiles around it pick their variants again
+        left, top, right, bottom = self.tile_bounds(breakable.rect)
+        for ty in range(top, bottom + 1):
+            for tx in range(left, right + 1):
+                self.remove_tile(tx, ty)
+
+    def tile_changed(self, tx, ty):
+        # The edited tile and its autotiled neighbours may all look different now
+        autotile(self.grid, (tx - 1, ty - 1, tx + 1, ty + 1))
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                self.chunks.invalidate_tile(tx + dx, ty + dy)
 
-        self.items.draw(surface, (camera_offset.x, camera_offset.y))
+    def render(self, surface, camera_offset, layer):
+        if not self.loaded:
+            return
 
-        self.enemies.draw(surface, (camera_offset.x, camera_offset.y))
+        camera_offset = pygame.math.Vector2(camera_offset)
+        debug = self.game.debug
 
-        self.breakables.draw(surface, (camera_offset.x, camera_offset.y))
+        camera = self.game.camera
+        view = camera.view_rect()
 
-        for tile in self.tile_map.values():
-            if tile.get("z") != layer:
-                continue
+        self.chunks.draw(surface, camera_offset, DARK_LAYER, camera)
 
-            if tile.get("variant") is None:
-                continue
-
-            env = tile.get('environment')
-            ttype = tile.get('type')
-            if tile.get("variant") == "dark":
-                continue
-            variant = int(tile.get('variant'))
+        self.decorations.draw(surface, camera_offset, camera)
 
-            try:
-                img = self.game.assets[env][ttype].get_images_list()[variant]
-            except (KeyError, IndexError):
-                img = None
+        self.chests.draw(surface, camera_offset, camera)
 
-            if img is None:
-                continue
+        self.items.draw(surface, (camera_offset.x, camera_offset.y), camera)
 
-            try:
-                img = pygame.transform.scale(img, (scale_sizing[env][ttype].get(str(variant), (self.tile_size, self.tile_size))))
-            except (TypeError, KeyError):
-                img = pygame.transform.scale(img, (self.tile_size, self.tile_size))
+        self.breakables.draw(surface, (camera_offset.x, camera_offset.y), camera)
 
-            world_pos = (tile['x'] * self.tile_size, tile['y'] * self.tile_size)
+        self.render_layers(surface, camera_offset, [layer] if isinstance(layer, int) else layer)
 
-            screen_pos = (int(world_pos[0] - camera_offset.x), int(world_pos[1] - camera_offset.y))
-
-            surface.blit(img, screen_pos)
-
-        for tile in self.tile_map.values():
-            world_pos = (tile['x'] * self.tile_size, tile['y'] * self.tile_size)
-
-            screen_pos = (int(world_pos[0] - camera_offset.x), int(world_pos[1] - camera_offset.y))
-            if 'solid' in tile.get('properties', []) and config.get("debug", {}).get("show_platform_hitboxes", False):
+        if debug.get("show_platform_hitboxes", False):
+            grid = self.grid
+            pos_x, pos_y = int(self.pos.x), int(self.pos.y)
+            for tx, ty, cell in grid.iter_rect(*self.tile_bounds(view)):
+                if not cell[3] & FLAG_SOLID:
+                    continue
                 debug_rect = pygame.Rect(
-                    screen_pos[0],
-                    screen_pos[1],
+                    int((tx + pos_x) * self.tile_size - camera_offset.x),
+                    int((ty + pos_y) * self.tile_size - camera_offset.y),
                     self.tile_size,
                     self.tile_size
                 )
                 pygame.draw.rect(surface, (0, 255, 0), debug_rect, 1)
 
-        for sensor in self.sensors.values():
-            if config.get("debug", {}).get("show_sensors", False):
-                rect = pygame.Rect(sensor["x"]*self.tile_size - camera_offset.x, sensor["y"]*self.tile_size - camera_offset.y, sensor["w"]*self.tile_size, sensor["h"]*self.tile_size)
-                pygame.draw.rect(surface, (255, 0, 0), rect, 1)
+        if debug.get("show_sensors", False):
+            for sensor in self.sensors.values():
+                if view.colliderect(sensor.rect):
+                    pygame.draw.rect(surface, (255, 0, 0), sensor.rect.move(-camera_offset), 1)
 
-        self.crystals.draw(surface, (camera_offset.x, camera_offset.y))
+        self.crystals.draw(surface, (camera_offset.x, camera_offset.y), camera)
 
         if self.overlay and self.rendered:
             overlay_img = pygame.image.load(self.overlay).convert_alpha()
             overlay_img = pygame.transform.scale(overlay_img, (self.width * self.tile_size, self.height * self.tile_size))
             surface.blit(overlay_img, (-camera_offset.x, - camera_offset.y))
 
+    def render_layers(self, surface, camera_offset, layers):
+        # Draws the tiles of each z layer in the given order, every layer only
+        # bakes and blits its own chunks
+        for layer in layers:
+            self.chunks.draw(surface, camera_offset, layer, self.game.camera)
+
+    def layers(self):
+        return self.grid.layer_ids()
+
     def is_solid(self, pos, offset):
-        x = pos[0] // self.tile_size
-        y = pos[1] // self.tile_size
-
-        x += offset[0]
-        y += offset[1]
-
-        for i, o in self.tile_map.keys():
-            if i == x and o == y:
-                if "solid" in self.tile_map[x][y]["properties"]:
-                    return True
-                else:
-                    return False
-            else:
-                return False
-        return False
+        x = int(pos[0] // self.tile_size) + offset[0]
+        y = int(pos[1] // self.tile_size) + offset[1]
+        return self.grid.is_solid(x, y)
+
+    # Tile queries used by the physics code. Tile coordinates are local to the
+    # map (pos is not included), pixel rects are in world space.
+    def tile_bounds(self, rect):
+        origin_x = self.pos.x * self.tile_size
+        origin_y = self.pos.y * self.tile_size
+        left = int(rect.left - origin_x) // self.tile_size
+        right = int(rect.right - 1 - origin_x) // self.tile_size
+        top = int(rect.top - origin_y) // self.tile_size
+        bottom = int(rect.bottom - 1 - origin_y) // self.tile_size
+        return left, top, right, bottom
+
+    def tile_rect(self, tx, ty):
+        return pygame.Rect((tx + int(self.pos.x)) * self.tile_size,
+                           (ty + int(self.pos.y)) * self.tile_size,
+                           self.tile_size, self.tile_size)
+
+    def solid_at(self, tx, ty):
+        return self.grid.is_solid(tx, ty)
+
+    def solids_in_rect(self, rect):
+        return self.grid.solids_in(*self.tile_bounds(rect))
+
+    def first_solid_below(self, left, right, ty, max_rows=1):
+        for row in range(ty, ty + max_rows):
+            if self.grid.solid_in_span(left, right, row):
+                return row
+        return None
 
     def update(self, dt):
+        if not self.loaded:
+            return
+
         self.chests.update(dt)
 
         self.items.update(dt)
@@ -386,49 +408,6 @@ class TileMap:
 
         self.breakables.update(dt)
 
-        for sensor in self.sensors.values():
-            if sensor["type"] == "render":
-                rect = pygame.Rect(sensor["x"] * self.tile_size,
-                                   sensor["y"] * self.tile_size,
-                                   sensor["w"] * self.tile_size,
-                                   sensor["h"] * self.tile_size)
-
-                player_in_sensor = rect.colliderect(self.game.player.rect)
-
-                for prop in sensor["properties"]:
-                    if "render" in prop and not sensor["triggered"] and "derender" not in prop and "toggle_render" not in prop:
-                        map_name = prop.split(":")[1]
-                        if player_in_sensor:
-                            self.game.tilemap_current = map_name
-                            self.game.tilemap = self.game.tilemaps[self.game.tilemap_current]
-                            self.game.tilemaps[map_name].rendered = True
-                            sensor["triggered"] = True
-
-                    if "derender" in prop and not sensor["triggered"]:
-                        map_name = prop.split(":")[1]
-                        if player_in_sensor:
-                            self.game.tilemap_current = map_name
-                            self.game.tilemap = self.game.tilemaps[self.game.tilemap_current]
-                            self.game.tilemaps[map_name].rendered = False
-                            sensor["triggered"] = True
-
-                    if "toggle_render" in prop and not sensor["triggered"]:
-                        map_name = prop.split(":")[1]
-                        if player_in_sensor:
-                            self.game.tilemaps[map_name].rendered = not self.game.tilemaps[map_name].rendered
-
-                            current_found = False
-                            for name, tilemap in self.game.tilemaps.items():
-                                if tilemap.rendered:
-                                    self.game.tilemap_current = name
-                                    self.game.tilemap = tilemap
-                                    current_found = True
-                                    break
-
-                            if not current_found:
-                                pass
-
-                            sensor["triggered"] = True
-
-                if sensor["triggered"] and not player_in_sensor:
-                    sensor["triggered"] = False
+        self.decorations.update(dt)
+
+        self.sensor_index.update(self.game, self.game.player.rect)
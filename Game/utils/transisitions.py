@@ -1,17 +1,170 @@
+import math
+
 import pygame
 
-class Fadeout:
-    def __init__(self, duration=1, color=(0, 0, 0)):
+
+class Transition:
+    # A full screen effect that runs for duration seconds of update(dt).
+    # amount goes from 0 (screen clear) to 1 (screen covered), reverse plays
+    # it the other way. The overlay surface is made once and reused, only made
+    # again if the screen size changes.
+    def __init__(self, duration=1, color=(0, 0, 0), reverse=False):
         self.duration = duration
         self.color = color
-        self.opacity = 0
+        self.reverse = reverse
+        self.elapsed = 0.0
+        self.surface = None
+
+    def reset(self, reverse=None):
+        self.elapsed = 0.0
+        if reverse is not None:
+            self.reverse = reverse
+
+    def update(self, dt):
+        self.elapsed = min(self.duration, self.elapsed + dt)
+
+    @property
+    def done(self):
+        return self.elapsed >= self.duration
+
+    @property
+    def amount(self):
+        t = self.elapsed / self.duration if self.duration > 0 else 1
+        return 1 - t if self.reverse else t
+
+    def overlay(self, screen):
+        if self.surface is None or self.surface.get_size() != screen.get_size():
+            self.surface = pygame.Surface(screen.get_size())
+            self.prepare()
+        return self.surface
+
+    def prepare(self):
+        self.surface.fill(self.color)
+
+    def draw(self, screen):
+        # the base effect draws nothing, subclasses cover the screen
+        pass
+
+
+class Fade(Transition):
+    @property
+    def opacity(self):
+        return int(255 * self.amount)
+
+    def draw(self, screen):
+        opacity = self.opacity
+        if opacity <= 0:
+            return
+        overlay = self.overlay(screen)
+        overlay.set_alpha(opacity)
+        screen.blit(overlay, (0, 0))
+
+
+class Wipe(Transition):
+    # Covers the screen from one edge, direction (1, 0) wipes left to right
+    def __init__(self, duration=1, color=(0, 0, 0), reverse=False, direction=(1, 0)):
+        super().__init__(duration, color, reverse)
+        self.direction = direction
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+    def draw(self, screen):
+        width, height = screen.get_size()
+        dx, dy = self.direction
+        amount = self.amount
+        rect = self.rect
+        rect.width = int(width * amount) if dx else width
+        rect.height = int(height * amount) if dy else height
+        rect.x = width - rect.width if dx < 0 else 0
+        rect.y = height - rect.height if dy < 0 else 0
+        if rect.width and rect.height:
+            screen.fill(self.color, rect)
+
+
+class Iris(Transition):
+    # A circle around center (the middle of the screen by default) that
+    # closes until the screen is covered
+    def __init__(self, duration=1, color=(0, 0, 0), reverse=False, center=None):
+        super().__init__(duration, color, reverse)
+        self.center = center
+        # any color that isn't the overlay color works as the hole
+        self.key = tuple(255 - c for c in color[:3])
+
+    def prepare(self):
+        self.surface.set_colorkey(self.key)
 
     def draw(self, screen):
-        if self.opacity < 255:
-            self.opacity += 255 / (self.duration * 60)
-            if self.opacity > 255:
-                self.opacity = 255
-        overlay = pygame.Surface((screen.get_width(), screen.get_height()))
+        amount = self.amount
+        if amount <= 0:
+            return
+        width, height = screen.get_size()
+        cx, cy = self.center if self.center is not None else (width // 2, height // 2)
+        # far enough to reach the corner furthest from the center
+        radius = int(math.hypot(max(cx, width - cx), max(cy, height - cy)) * (1 - amount))
+
+        overlay = self.overlay(screen)
         overlay.fill(self.color)
-        overlay.set_alpha(int(self.opacity))
-        screen.blit(overlay, (0, 0))
\ No newline at end of file
+        if radius > 0:
+            pygame.draw.circle(overlay, self.key, (cx, cy), radius)
+        screen.blit(overlay, (0, 0))
+
+
+TRANSITIONS = {
+    "fade": Fade,
+    "wipe": Wipe,
+    "iris": Iris,
+}
+
+
+class Transitions:
+    # The transition playing over the whole game. swap() covers the screen,
+    # calls on_covered (e.g. to swap tilemaps) and uncovers it again. There is
+    # one effect object per kind, reused every time it plays.
+    def __init__(self):
+        self.effects = {}
+        self.current = None
+        self.on_covered = None
+
+    def effect(self, name):
+        effect = self.effects.get(name)
+        if effect is None:
+            effect = self.effects[name] = TRANSITIONS[name]()
+        return effect
+
+    def play(self, name, duration=None, reverse=False):
+        effect = self.effect(name)
+        if duration is not None:
+            effect.duration = duration
+        effect.reset(reverse)
+        self.current = effect
+        return effect
+
+    def swap(self, name, on_covered, duration=0.6):
+        # half the duration to cover the screen, half to uncover it
+        if self.on_covered is not None:
+            self.on_covered()
+        self.play(name, duration / 2)
+        self.on_covered = on_covered
+
+    @property
+    def active(self):
+        return self.current is not None
+
+    def update(self, dt):
+        effect = self.current
+        if effect is None:
+            return
+        effect.update(dt)
+        if not effect.done:
+            return
+
+        if self.on_covered is not None:
+            on_covered = self.on_covered
+            self.on_covered = None
+            on_covered()
+            effect.reset(reverse=True)
+        elif effect.reverse:
+            self.current = None
+
+    def draw(self, screen):
+        if self.current is not None:
+            self.current.draw(screen)
@@ -2,22 +2,15 @@ import pygame
 import os
 import json
 
+from Game.utils.assets import assets
+from Game.utils.bake import write_bake
+
 BASE_IMG_PATH = "Game/assets/"
 TILE_SIZE = 48
 
 def load_image(path, colorkey=None, size=None):
-    img = pygame.image.load(BASE_IMG_PATH + path)
-    if size is not None:
-        img = pygame.transform.scale(img, size)
-    try:
-        img = img.convert_alpha()
-    except FileNotFoundError:
-        pass
-    if colorkey is not None:
-        img.set_colorkey(colorkey)
-    if "icon_" in path:
-        img = pygame.transform.scale(img, (16, 16))
-    return img
+    # Cached by AssetManager, the returned surface is shared between callers
+    return assets.image(path, colorkey=colorkey, size=size)
 
 
 def load_images(path):
@@ -27,37 +20,93 @@ def load_images(path):
     return images
 
 def load_json_as_dict(path):
-    with open(BASE_IMG_PATH + path, 'r') as f:
-        data = json.load(f)
-    return data
+    return assets.json(path)
 
 class SpriteSheet:
-    def __init__(self, path, tile_size=None, cut=None, colorkey=None):
+    def __init__(self, path, tile_size=None, cut=None, colorkey=None, scale=None, bake=True):
         self.images = {}
         self.path = path
         self.tile_size = tile_size
         self.colorkey = colorkey
+        # every frame is scaled to this size when given
+        self.scale = tuple(scale) if scale is not None else None
+        # extra data stored with the bake, e.g. the player's character bounds
+        self.meta = {}
 
         # avoid mutable default; if provided as JSON lists, keep them but coerce later
         self.cut = cut if cut is not None else {"0": (0, 0, 64, 64)}
 
+        self.key = None
+        self.base = None
+        self.bake_path = None
+        if bake:
+            try:
+                self.bake_path = assets.bake_path(BASE_IMG_PATH + path, self.bake_options())
+            except OSError:
+                pass
+
+        baked = assets.bake(self.bake_path) if self.bake_path else None
+        if baked is not None:
+            frames, meta = baked
+            self.key = ("bake", self.bake_path)
+            assets.acquire(self.key)
+            self.meta = dict(meta)
+            self.images = dict(frames)
+            for img in self.images.values():
+                if colorkey is not None:
+                    img.set_colorkey(colorkey)
+            return
+
+        # keeps the sheet image cached for as long as the sheet is alive
+        self.key = assets.image_key(path, colorkey)
+        self.base = load_image(path, colorkey=colorkey)
+        assets.acquire(self.key)
+
         if tile_size:
             self.get_images()
         else:
             self.cut_images()
 
+        if self.scale is not None:
+            for key, img in self.images.items():
+                self.images[key] = pygame.transform.scale(img, self.scale)
+
+        self.save_bake()
+
+    def bake_options(self):
+        return self.options(self.tile_size, self.cut, self.colorkey, self.scale)
+
+    @staticmethod
+    def options(tile_size=None, cut=None, colorkey=None, scale=None):
+        # Everything besides the source image that changes the baked frames
+        if tile_size:
+            cut = None
+        elif cut is None:
+            cut = {"0": (0, 0, 64, 64)}
+        return {"tile_size": tile_size, "cut": cut, "colorkey": colorkey,
+                "scale": tuple(scale) if scale is not None else None}
+
+    def save_bake(self):
+        if self.bake_path is None:
+            return
+        try:
+            write_bake(self.bake_path, list(self.images.items()), self.meta)
+        except OSError:
+            pass
+
+    def release(self, drop=False):
+        if self.key is not None:
+            assets.release(self.key, drop)
+            self.key = None
+
     def get_images(self):
-        base = load_image(self.path, colorkey=self.colorkey)
-        rect = base.get_rect()
+        rect = self.base.get_rect()
 
         for y in range(0, rect.height, self.tile_size):
             for x in range(0, rect.width, self.tile_size):
-                temp = pygame.Surface((self.tile_size, self.tile_size), flags=pygame.SRCALPHA)
-                temp.blit(base, (0, 0), pygame.Rect(x, y, self.tile_size, self.tile_size))
-                self.images[(x, y)] = temp
+                self.images[(x, y)] = self.frame(pygame.Rect(x, y, self.tile_size, self.tile_size))
 
     def cut_images(self):
-        base = load_image(self.path, colorkey=self.colorkey)
         for key, rect_vals in self.cut.items():
             # be defensive: allow JSON lists/tuples and skip invalid entries
             try:
@@ -65,9 +114,19 @@ class SpriteSheet:
             except (TypeError, ValueError):
                 continue
             if w > 0 and h > 0:
-                temp = pygame.Surface((w, h), flags=pygame.SRCALPHA)
-                temp.blit(base, (0, 0), pygame.Rect(x, y, w, h))
-                self.images[str(key)] = temp
+                self.images[str(key)] = self.frame(pygame.Rect(x, y, w, h))
+
+    def frame(self, rect):
+        # Frames are subsurfaces sharing the pixels of the sheet, only frames
+        # hanging over the edge of the sheet get their own padded surface
+        if self.base.get_rect().contains(rect):
+            return self.base.subsurface(rect)
+        temp = pygame.Surface(rect.size, flags=pygame.SRCALPHA)
+        temp.blit(self.base, (0, 0), rect)
+        return temp
+
+    def pack(self, atlas):
+        return pack_sheets([self], atlas)
 
     def get_images_list(self):
         sprites = []
@@ -76,7 +135,7 @@ class SpriteSheet:
         return sprites
 
     def get_debug_image(self):
-        base = load_image(self.path, colorkey=self.colorkey)
+        base = self.base if self.base is not None else load_image(self.path, colorkey=self.colorkey)
         base_copy = base.copy()
         rect = base_copy.get_rect()
         pygame.draw.rect(base_copy, (255, 0, 0), rect, 4)
@@ -88,6 +147,22 @@ class SpriteSheet:
 
         return base_copy
 
+def pack_sheets(sheets, atlas):
+    # Moves the frames of the sheets into shared atlas pages and drops the
+    # sheet images, only done when the pages take less memory than them
+    frames = [img for sheet in sheets for img in sheet.images.values()]
+    packed = atlas.pack(frames)
+    if packed is None:
+        return False
+
+    packed = iter(packed)
+    for sheet in sheets:
+        for key in sheet.images:
+            sheet.images[key] = next(packed)
+        sheet.base = None
+        sheet.release(drop=True)
+    return True
+
 class Animation:
     def __init__(self, images, img_dur=5, loop=True):
         self.images = images
@@ -109,3 +184,18 @@ class Animation:
 
     def img(self):
         return self.images[int(self.frame / self.img_duration)]
+
+
+def sprite_bounds(surface):
+    # Bounding box of the pixels that are visible and not pure black, black
+    # being the colorkey of the character sheets. None for an empty frame.
+    surface = surface.copy()
+    surface.set_colorkey(None)
+    mask = pygame.mask.from_surface(surface, 0)
+    mask.erase(pygame.mask.from_threshold(surface, (0, 0, 0, 255), (1, 1, 1, 255)), (0, 0))
+
+    rects = mask.get_bounding_rects()
+    if not rects:
+        return None
+    rect = rects[0].unionall(rects[1:])
+    return {'left': rect.left, 'top': rect.top, 'width': rect.width, 'height': rect.height}
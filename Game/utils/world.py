@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from Game.utils.decorations import decode_decorations
+from Game.utils.levels import cached_bounds, level_bounds, load_level
+
+PREFETCH_RADIUS = 1000
+MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+def load_region(source):
+    # Worker side of a load: the level and the decoded frames of its
+    # decorations, apply_level only converts them
+    level = load_level(source)
+    level.decoration_frames = decode_decorations(level.layers)
+    return level
+
+
+class Region:
+    def __init__(self, name, tilemap, source):
+        self.name = name
+        self.tilemap = tilemap
+        self.source = source
+        self.rect = None
+        self.bounds_job = None
+
+    def bounds(self, executor, wait=False):
+        # World pixel rect of the level, None while it isn't known yet. It is
+        # read from the header of the compiled level, a level that isn't
+        # compiled yet is compiled on the worker and wait blocks for that.
+        if self.rect is None:
+            if self.bounds_job is None:
+                tile_bounds = cached_bounds(self.source)
+                if tile_bounds is None:
+                    self.bounds_job = executor.submit(level_bounds, self.source)
+                else:
+                    self.set_bounds(tile_bounds)
+            if self.bounds_job is not None and (wait or self.bounds_job.done()):
+                self.set_bounds(self.bounds_job.result())
+                self.bounds_job = None
+        return self.rect
+
+    def set_bounds(self, tile_bounds):
+        min_x, min_y, max_x, max_y, tile_size = tile_bounds
+        pos = self.tilemap.pos
+        self.rect = pygame.Rect((min_x + int(pos.x)) * tile_size, (min_y + int(pos.y)) * tile_size,
+                                (max_x - min_x + 1) * tile_size, (max_y - min_y + 1) * tile_size)
+
+
+class World:
+    # Pages TileMaps in and out around the player. Every region within
+    # prefetch_radius pixels of the player is loaded, the others stay resident
+    # until the loaded regions go over memory_budget bytes and are then
+    # unloaded least recently used first.
+    #
+    # Levels are read on a worker thread and handed to their TileMap on the
+    # main thread by poll(), require() waits for a level that is needed now.
+    def __init__(self, prefetch_radius=PREFETCH_RADIUS, memory_budget=MEMORY_BUDGET):
+        self.prefetch_radius = prefetch_radius
+        self.memory_budget = memory_budget
+        self.regions = {}
+        self.resident = OrderedDict()
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-loader")
+
+    def add(self, name, tilemap, source):
+        self.regions[name] = Region(name, tilemap, source)
+        return tilemap
+
+    def request(self, name):
+        region = self.regions[name]
+        if region.tilemap.loaded:
+            self.resident[name] = region
+            self.resident.move_to_end(name)
+        elif name not in self.pending:
+            self.pending[name] = self.executor.submit(load_region, region.source)
+
+    def finish(self, name):
+        region = self.regions[name]
+        region.tilemap.apply_level(self.pending.pop(name).result())
+        self.resident[name] = region
+
+    def poll(self):
+        for name, future in list(self.pending.items()):
+            if future.done():
+                self.finish(name)
+
+    def require(self, name):
+        self.request(name)
+        if name in self.pending:
+            self.finish(name)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def unload(self, name):
+        region = self.resident.pop(name, None)
+        if region is not None:
+            region.tilemap.unload()
+
+    def memory_size(self):
+        return sum(region.tilemap.memory_size() for region in self.resident.values())
+
+    def update(self, rect, wait=False):
+        area = rect.inflate(self.prefetch_radius * 2, self.prefetch_radius * 2)
+
+        near = set()
+        for name, region in self.regions.items():
+            bounds = region.bounds(self.executor, wait)
+            if bounds is None:
+                continue
+            if area.colliderect(bounds):
+                near.add(name)
+                self.request(name)
+            # a region the player is already inside can't wait for the worker
+            if wait or bounds.colliderect(rect):
+                if name in self.pending:
+                    self.finish(name)
+        self.poll()
+
+        if self.memory_size() <= self.memory_budget:
+            return
+
+        for name in list(self.resident):
+            if name in near:
+                continue
+            self.unload(name)
+            if self.memory_size() <= self.memory_budget:
+                break